@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Inference backend selection for CPU-only edge boxes.
+
+- Exports MODEL_NAME once to OpenVINO and/or ONNX Runtime (via
+  ultralytics' exporter) and caches the artifacts next to the .pt weights.
+- OpenVINO can optionally be INT8-quantized, calibrated on our own stored
+  frames (FRAME_ROOT), which matches the scenes the model actually sees.
+- load_model() loads the fastest backend that is installed and works,
+  falling back to the plain PyTorch .pt weights.
+
+Examples:
+  # export every available backend up front (otherwise done lazily at start-up)
+  python backends.py --export
+
+  # latency per backend on local images
+  python backends.py --benchmark-backends --images frames/2025-11-20 --runs 3
+"""
+import argparse
+import glob
+import os
+import random
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+from colorama import Fore, Style
+from ultralytics import YOLO
+
+from config import (
+    MODEL_NAME,
+    FRAME_ROOT,
+    INFERENCE_BACKEND,
+    INFERENCE_INT8,
+    INFERENCE_CALIB_IMAGES,
+)
+
+
+def be_ok(m): print(Fore.GREEN + m + Style.RESET_ALL)
+def be_info(m): print(Fore.CYAN + m + Style.RESET_ALL)
+def be_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+# fastest first (on Intel/ARM CPUs OpenVINO usually beats ONNX Runtime)
+_AUTO_ORDER = ("openvino", "onnx", "pt")
+
+
+def _runtime_available(backend: str) -> bool:
+    try:
+        if backend == "openvino":
+            import openvino  # noqa: F401
+        elif backend == "onnx":
+            import onnxruntime  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def _artifact_path(backend: str, int8: bool) -> str:
+    """Where ultralytics' exporter puts the model (next to the .pt weights)."""
+    stem = os.path.splitext(MODEL_NAME)[0]
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    return MODEL_NAME
+
+
+def _calibration_yaml(names: Dict[int, str]) -> Optional[str]:
+    """Dataset yaml over a sample of our RAW frames, for INT8 calibration."""
+    frames = glob.glob(os.path.join(FRAME_ROOT, "*", "*_raw.*"))
+    if not frames:
+        return None
+    random.shuffle(frames)
+
+    calib_dir = os.path.abspath(os.path.join(
+        os.path.dirname(os.path.abspath(MODEL_NAME)), "calib", "images"))
+    os.makedirs(calib_dir, exist_ok=True)
+    for src in frames[:INFERENCE_CALIB_IMAGES]:
+        dst = os.path.join(calib_dir, os.path.basename(src))
+        if not os.path.exists(dst):
+            try:
+                os.symlink(os.path.abspath(src), dst)
+            except OSError:
+                continue
+
+    yaml_path = os.path.join(os.path.dirname(calib_dir), "calib.yaml")
+    with open(yaml_path, "w", encoding="utf-8") as f:
+        f.write(f"path: {os.path.dirname(calib_dir)}\n")
+        f.write("train: images\nval: images\nnames:\n")
+        for k in sorted(names):
+            f.write(f"  {k}: {names[k]}\n")
+    return yaml_path
+
+
+def export_backend(backend: str, int8: bool = INFERENCE_INT8) -> Optional[str]:
+    """Export MODEL_NAME for this backend (once); returns the artifact path."""
+    if backend == "pt":
+        return MODEL_NAME
+
+    int8 = int8 and backend == "openvino"  # ultralytics quantizes OpenVINO only
+    path = _artifact_path(backend, int8)
+    if os.path.exists(path):
+        return path
+
+    be_info(f"[BACKEND] exporting {MODEL_NAME} -> {backend}"
+            + (" (int8)" if int8 else "") + " ...")
+    base = YOLO(MODEL_NAME)
+    kwargs = {"format": backend, "dynamic": True}  # dynamic: batch + imgsz vary
+    if int8:
+        data = _calibration_yaml(base.names)
+        if data is None:
+            be_warn("[BACKEND] no stored frames for INT8 calibration; exporting FP32")
+            path = _artifact_path(backend, False)
+            if os.path.exists(path):
+                return path
+        else:
+            kwargs.update(int8=True, data=data)
+
+    out = base.export(**kwargs)
+    return str(out) if out else None
+
+
+def _backend_order() -> Tuple[str, ...]:
+    choice = (INFERENCE_BACKEND or "auto").lower()
+    if choice == "auto":
+        return _AUTO_ORDER
+    return (choice, "pt") if choice != "pt" else ("pt",)
+
+
+def load_model() -> Tuple[YOLO, str]:
+    """Load the fastest usable backend; always falls back to the .pt weights."""
+    for backend in _backend_order():
+        if backend != "pt" and not _runtime_available(backend):
+            continue
+        try:
+            path = export_backend(backend)
+            if not path:
+                continue
+            model = YOLO(path, task="detect")
+            be_ok(f"[BACKEND] using {backend}: {path}")
+            return model, backend
+        except Exception as e:
+            be_warn(f"[BACKEND] {backend} unavailable: {e}")
+
+    return YOLO(MODEL_NAME), "pt"  # auto-downloads on first use
+
+
+# ---------------- benchmark ----------------
+
+def benchmark_backends(image_paths: List[str], runs: int = 3) -> Dict[str, Dict[str, float]]:
+    """Median / mean predict latency per available backend on local images."""
+    import cv2
+
+    images = [img for img in (cv2.imread(p) for p in image_paths) if img is not None]
+    if not images:
+        raise SystemExit("No readable images to benchmark on")
+
+    report: Dict[str, Dict[str, float]] = {}
+    for backend in _AUTO_ORDER:
+        if backend != "pt" and not _runtime_available(backend):
+            be_warn(f"[BENCH] {backend}: runtime not installed, skipped")
+            continue
+        try:
+            model = YOLO(export_backend(backend), task="detect")
+            model.predict(images[0], verbose=False)  # warm-up / lazy init
+            times = []
+            for _ in range(runs):
+                for img in images:
+                    t0 = time.perf_counter()
+                    model.predict(img, verbose=False)
+                    times.append((time.perf_counter() - t0) * 1000.0)
+            report[backend] = {
+                "median_ms": round(statistics.median(times), 2),
+                "mean_ms": round(statistics.fmean(times), 2),
+                "images": len(images),
+                "runs": runs,
+            }
+            be_ok(f"[BENCH] {backend:9s} median={report[backend]['median_ms']:8.2f} ms "
+                  f"mean={report[backend]['mean_ms']:8.2f} ms")
+        except Exception as e:
+            be_warn(f"[BENCH] {backend}: failed: {e}")
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inference backend export / benchmark")
+    ap.add_argument("--export", action="store_true",
+                    help="Export every available backend now")
+    ap.add_argument("--benchmark-backends", action="store_true",
+                    help="Report latency per backend on local images")
+    ap.add_argument("--images", default=None,
+                    help="Image file or directory (default: stored RAW frames from all days, else test.jpg)")
+    ap.add_argument("--limit", type=int, default=20,
+                    help="Max images to benchmark on")
+    ap.add_argument("--runs", type=int, default=3,
+                    help="Passes over the image set per backend")
+    args = ap.parse_args()
+
+    if args.export:
+        for backend in _AUTO_ORDER:
+            if backend == "pt" or _runtime_available(backend):
+                print(f"[BACKEND] {backend}: {export_backend(backend)}")
+
+    if args.benchmark_backends:
+        if args.images and os.path.isdir(args.images):
+            paths = sorted(glob.glob(os.path.join(args.images, "*.jpg"))
+                           + glob.glob(os.path.join(args.images, "*.webp")))
+        elif args.images:
+            paths = [args.images]
+        else:
+            paths = sorted(glob.glob(os.path.join(FRAME_ROOT, "*", "*_raw.*"))) or ["test.jpg"]
+        benchmark_backends(paths[:args.limit], args.runs)
+
+    if not (args.export or args.benchmark_backends):
+        ap.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Offline per-stage latency benchmark for the detection path.
+
+Replays a directory of images (or a local video file) through the real
+detect.py / db.py functions -- no cameras, no network -- and reports
+p50 / p95 / p99 per stage, throughput and peak RSS for each
+(model, camera count) combination.
+
+Stages: grab (decode), class_map, inference, extract, roi_map, draw,
+encode_save, json, store (queued until committed by the writer thread).
+
+Everything is written to a temporary directory (frames + SQLite DB), so
+the real edge_data.db and frames/ are never touched.
+
+Examples:
+  python bench.py --images frames/2025-11-20 --cameras 1,8,32 --ticks 5
+  python bench.py --video lot.mp4 --models yolo11n.pt,yolo11n_openvino_model \
+      --targets person,car --out bench.json
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Dict, Iterator, List
+
+import cv2
+import numpy as np
+
+import config
+
+# Redirect all side effects before detect/db read their config values.
+_TMP = tempfile.mkdtemp(prefix="edge-bench-")
+config.DB_NAME = os.path.join(_TMP, "bench.db")
+config.FRAME_ROOT = os.path.join(_TMP, "frames")
+config.REMOTE_TARGETS_URL = None
+config.CAPTURE_PERSISTENT = False
+
+import detect  # noqa: E402
+import db  # noqa: E402
+from encode import encode_settings  # noqa: E402
+from metacodec import encode_meta  # noqa: E402
+from render import draw_annotations  # noqa: E402
+from roi import crop_to_roi, map_to_frame, parse_roi  # noqa: E402
+
+STAGES = ("grab", "class_map", "inference", "extract", "roi_map",
+          "draw", "encode_save", "json", "store")
+
+
+def _frame_source(images: str | None, video: str | None) -> Iterator[np.ndarray]:
+    """Endless stream of decoded frames (decode time is the 'grab' stage)."""
+    if video:
+        while True:
+            cap = cv2.VideoCapture(video)
+            ok, frame = cap.read()
+            if not ok:
+                raise SystemExit(f"Cannot read video: {video}")
+            while ok:
+                yield frame
+                ok, frame = cap.read()
+            cap.release()
+
+    paths = [images] if images and os.path.isfile(images) else sorted(
+        glob.glob(os.path.join(images or ".", "*.jpg"))
+        + glob.glob(os.path.join(images or ".", "*.png"))
+        + glob.glob(os.path.join(images or ".", "*.webp")))
+    if not paths:
+        raise SystemExit(f"No images found in {images}")
+    while True:
+        for p in paths:
+            img = cv2.imread(p, cv2.IMREAD_COLOR)
+            if img is not None:
+                yield img
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return round(float(np.percentile(values, q)), 3)
+
+
+def _store_committed(*args) -> None:
+    # store_local only queues the row; time it up to the writer's commit
+    db.store_local(*args)
+    db.flush_db()
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def run_config(model_name: str, n_cameras: int, ticks: int, frames: Iterator[np.ndarray],
+               targets: List[str], imgsz: int | None, roi) -> Dict:
+    from ultralytics import YOLO
+
+    model = YOLO(model_name, task="detect")
+    detect._MODEL, detect._MODEL_BACKEND = model, os.path.splitext(model_name)[1] or "dir"
+    names = detect._model_names(model)
+
+    cameras = [{"key": f"BENCH{i}", "id": f"BENCH{i}", "imgsz": imgsz, "roi": roi}
+               for i in range(n_cameras)]
+    times: Dict[str, List[float]] = {s: [] for s in STAGES}
+
+    # warm-up (lazy model init is not what we want to measure)
+    detect._infer_batch(model, [next(frames)], None, imgsz)
+
+    def timed(stage: str, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        times[stage].append((time.perf_counter() - t0) * 1000.0)
+        return out
+
+    day_dir = detect._day_dir()
+    t_start = time.perf_counter()
+    processed = 0
+    for _ in range(ticks):
+        raws = [timed("grab", next, frames) for _ in cameras]
+
+        classes_param = timed("class_map", detect._classes_for_targets, targets, names)
+        allowed = set(classes_param) if classes_param is not None else None
+        crops = [crop_to_roi(f, c["roi"]) for c, f in zip(cameras, raws)]
+
+        # batched inference, per-frame share of each batch's wall time
+        results = []
+        for start in range(0, len(crops), config.DETECT_BATCH_SIZE):
+            chunk = [c[0] for c in crops[start:start + config.DETECT_BATCH_SIZE]]
+            res, per_frame_ms = detect._infer_batch(model, chunk, classes_param, imgsz)
+            times["inference"].extend([per_frame_ms] * len(chunk))
+            results.extend((r, per_frame_ms) for r in res)
+
+        for camera, raw, (_, offset, polygon), (res, inf_ms) in zip(cameras, raws, crops, results):
+            dets = timed("extract", detect._extract_dets, res, names, allowed)
+            dets = timed("roi_map", map_to_frame, dets, offset, polygon)
+            enc = encode_settings(camera)
+
+            # encode_save covers both frames; draw is timed on its own
+            t0 = time.perf_counter()
+            raw_path = detect._save_frame(day_dir, camera["id"], "raw", raw, enc)
+            save_ms = (time.perf_counter() - t0) * 1000.0
+            ann_path = None
+            if dets and config.ANNOTATION_MODE == "image":
+                ann = timed("draw", draw_annotations, raw, dets)
+                t0 = time.perf_counter()
+                ann_path = detect._save_frame(day_dir, camera["id"], "annotated", ann, enc)
+                save_ms += (time.perf_counter() - t0) * 1000.0
+            times["encode_save"].append(save_ms)
+
+            h, w = raw.shape[:2]
+            meta = detect._with_encode(detect._to_meta(
+                camera["id"], w, h, dets, inf_ms, targets), enc)
+            meta_json = timed("json", encode_meta, meta)  # META_FORMAT (json / packed)
+            timed("store", _store_committed, camera["key"], len(dets),
+                  meta_json, raw_path, ann_path)
+            processed += 1
+
+    wall = time.perf_counter() - t_start
+    return {
+        "model": model_name,
+        "cameras": n_cameras,
+        "ticks": ticks,
+        "frames": processed,
+        "wall_sec": round(wall, 3),
+        "throughput_fps": round(processed / wall, 2) if wall > 0 else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages_ms": {
+            s: {"p50": _pct(v, 50), "p95": _pct(v, 95), "p99": _pct(v, 99),
+                "mean": round(statistics.fmean(v), 3) if v else 0.0, "n": len(v)}
+            for s, v in times.items()
+        },
+    }
+
+
+def _print_result(r: Dict) -> None:
+    print(f"\n== model={r['model']} cameras={r['cameras']} frames={r['frames']} "
+          f"-> {r['throughput_fps']} fps, peak RSS {r['peak_rss_mb']} MB")
+    print(f"   {'stage':12s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+    for stage, st in r["stages_ms"].items():
+        if st["n"]:
+            print(f"   {stage:12s} {st['p50']:9.2f} {st['p95']:9.2f} {st['p99']:9.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline per-stage detection benchmark")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--images", help="Image file or directory of images")
+    src.add_argument("--video", help="Local video file")
+    ap.add_argument("--models", default=config.MODEL_NAME,
+                    help="Comma-separated weights / exported models")
+    ap.add_argument("--cameras", default="1",
+                    help="Comma-separated simulated camera counts, e.g. 1,8,32")
+    ap.add_argument("--ticks", type=int, default=5,
+                    help="Detection ticks per configuration")
+    ap.add_argument("--targets", default="person",
+                    help="Comma-separated target classes ('all' for every class)")
+    ap.add_argument("--imgsz", type=int, default=None, help="Inference image size")
+    ap.add_argument("--roi", default=None,
+                    help="ROI as JSON, e.g. '[0.2,0.2,0.8,0.9]'")
+    ap.add_argument("--out", default=None, help="Write JSON results here")
+    args = ap.parse_args()
+
+    try:
+        db.init_db()
+        frames = _frame_source(args.images, args.video)
+        targets = [t.strip().lower() for t in args.targets.split(",") if t.strip()]
+        roi = parse_roi(json.loads(args.roi)) if args.roi else None
+
+        results = []
+        for model_name in [m.strip() for m in args.models.split(",") if m.strip()]:
+            for n in [int(x) for x in args.cameras.split(",") if x.strip()]:
+                r = run_config(model_name, n, args.ticks, frames, targets, args.imgsz, roi)
+                _print_result(r)
+                results.append(r)
+
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"results": results}, f, indent=2)
+            print(f"\n[BENCH] results written to {args.out}")
+    finally:
+        # scratch DB + frames; the writer may still hold queued rows
+        db.flush_db()
+        shutil.rmtree(_TMP, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Persistent RTSP capture: one long-lived reader thread per camera.
+
+- Each CaptureWorker keeps its cv2.VideoCapture open and keeps grabbing,
+  so the decoder never has to warm up again.
+- Only the latest decoded frame is kept (older ones are simply replaced).
+- Lost streams are reopened with exponential backoff.
+- CaptureManager.sync(cameras) starts/stops workers when the camera list changes.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from colorama import Fore, Style
+
+from config import (
+    CAPTURE_RECONNECT_START,
+    CAPTURE_RECONNECT_MAX,
+    CAPTURE_MAX_FRAME_AGE_SEC,
+)
+
+
+def cap_ok(m): print(Fore.GREEN + m + Style.RESET_ALL)
+def cap_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+# retrieve (decode + colour convert) at most this often; grab() in between
+# keeps the stream drained so the next retrieve is always the newest frame
+_RETRIEVE_EVERY_SEC = 0.5
+
+
+def camera_key(camera: Dict[str, Any]) -> str:
+    return str((camera or {}).get("key") or (camera or {}).get("id") or "unknown")
+
+
+def _usable(frame: Optional[np.ndarray]) -> bool:
+    if frame is None or not getattr(frame, "size", 0):
+        return False
+    # treat “all black” (decoder/pipeline) as unusable
+    return frame.mean() > 1.0 or frame.var() > 1.0
+
+
+class CaptureWorker(threading.Thread):
+    def __init__(self, key: str, rtsp: str):
+        super().__init__(daemon=True, name=f"capture-{key}")
+        self.key = key
+        self.rtsp = rtsp
+        self._stop_evt = threading.Event()
+        self._lock = threading.Lock()
+        self._fresh = threading.Condition(self._lock)  # notified on every new frame
+        self._frame: Optional[np.ndarray] = None
+        self._frame_ts: float = 0.0
+        self.backoff_sec = CAPTURE_RECONNECT_START
+
+    def stop(self) -> None:
+        self._stop_evt.set()
+
+    def latest(self) -> Tuple[Optional[np.ndarray], float]:
+        """Return (frame, capture_ts). The frame is never mutated afterwards."""
+        with self._lock:
+            return self._frame, self._frame_ts
+
+    def wait_fresh(self, max_age: float, timeout: float) -> Optional[np.ndarray]:
+        """Latest frame no older than max_age, waiting up to `timeout` for one."""
+        deadline = time.time() + timeout
+        with self._lock:
+            while True:
+                if self._frame is not None and time.time() - self._frame_ts <= max_age:
+                    return self._frame
+                left = deadline - time.time()
+                if left <= 0:
+                    return None
+                self._fresh.wait(left)
+
+    def _open(self) -> Optional[cv2.VideoCapture]:
+        cap = cv2.VideoCapture(self.rtsp, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except Exception:
+            pass
+        return cap
+
+    def _read_loop(self, cap: cv2.VideoCapture) -> None:
+        last_retrieve = 0.0
+        while not self._stop_evt.is_set():
+            if not cap.grab():
+                return  # stream dropped -> reconnect
+
+            now = time.time()
+            if now - last_retrieve < _RETRIEVE_EVERY_SEC:
+                continue
+
+            ret, frame = cap.retrieve()
+            last_retrieve = now
+            if not ret or not _usable(frame):
+                continue
+
+            with self._lock:
+                self._frame = frame
+                self._frame_ts = now
+                self._fresh.notify_all()
+            # a good frame means the connection is healthy again
+            self.backoff_sec = CAPTURE_RECONNECT_START
+
+    def run(self):
+        while not self._stop_evt.is_set():
+            cap = self._open()
+            if cap is not None:
+                cap_ok(f"[CAPTURE] camera={self.key} stream opened")
+                try:
+                    self._read_loop(cap)
+                except Exception as e:
+                    cap_warn(f"[CAPTURE] camera={self.key} read error: {e}")
+                finally:
+                    cap.release()
+
+            if self._stop_evt.is_set():
+                break
+
+            cap_warn(
+                f"[CAPTURE] camera={self.key} stream lost; "
+                f"reconnecting in {self.backoff_sec:.0f}s")
+            self._stop_evt.wait(self.backoff_sec)
+            self.backoff_sec = min(self.backoff_sec * 2, CAPTURE_RECONNECT_MAX)
+
+
+class CaptureManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._workers: Dict[str, CaptureWorker] = {}
+
+    def sync(self, cameras: List[Dict[str, Any]]) -> None:
+        """Start workers for new/changed cameras and stop the ones that went away."""
+        wanted = {camera_key(c): c.get("rtsp") for c in cameras if c.get("rtsp")}
+
+        with self._lock:
+            for key, worker in list(self._workers.items()):
+                if wanted.get(key) != worker.rtsp:
+                    worker.stop()
+                    del self._workers[key]
+                    cap_warn(f"[CAPTURE] camera={key} reader stopped")
+
+            for key, rtsp in wanted.items():
+                if key not in self._workers:
+                    worker = CaptureWorker(key, rtsp)
+                    worker.start()
+                    self._workers[key] = worker
+
+    def has_worker(self, camera: Dict[str, Any]) -> bool:
+        return camera_key(camera) in self._workers
+
+    def get_frame(self, camera: Dict[str, Any], wait: float = 0.0) -> Optional[np.ndarray]:
+        """Latest frame for this camera, or None if there is no fresh one
+        (after waiting up to `wait` seconds for the reader to deliver one)."""
+        worker = self._workers.get(camera_key(camera))
+        if worker is None:
+            return None
+        return worker.wait_fresh(CAPTURE_MAX_FRAME_AGE_SEC, wait)
+
+    def stop_all(self) -> None:
+        with self._lock:
+            for worker in self._workers.values():
+                worker.stop()
+            self._workers.clear()
+
+
+# process-wide manager; main.py feeds it the camera list
+manager = CaptureManager()
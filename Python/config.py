@@ -78,3 +78,124 @@ HEARTBEAT_EVERY_SEC: int = 60
 HEARTBEAT_DEVICE_ID: str = "Jetson Orin Nano Super"
 HEARTBEAT_URL: str = "https://aransolution.com/api/v1/EdgeDevices"
 HEARTBEAT_APP_VERSION: str = "1.0.0"
+
+# --- persistent RTSP capture (one long-lived reader per camera) ---
+# When True, main keeps a background reader per camera and detect_one just
+# takes the latest decoded frame instead of opening the stream every tick.
+CAPTURE_PERSISTENT: bool = True
+CAPTURE_RECONNECT_START: float = 2.0     # first reconnect delay (seconds)
+CAPTURE_RECONNECT_MAX: float = 60.0      # cap for reconnect backoff
+CAPTURE_MAX_FRAME_AGE_SEC: float = 10.0  # older frames are treated as stale
+CAPTURE_WAIT_FRESH_SEC: float = 2.0      # wait this long for a reader with no fresh frame, then skip the tick
+
+# --- batched inference across cameras ---
+# When True, each detection tick runs detect_many() over all cameras
+# (one batched forward pass per class filter / imgsz group) instead of
+# calling detect_one() per camera. Batched inference uses predict, not
+# track, so detections carry no track_id; off by default to keep tracking.
+DETECT_BATCHED: bool = False
+DETECT_BATCH_SIZE: int = 8
+
+# --- staged pipeline (capture -> inference -> encode -> persist) ---
+# When True, each stage runs on its own thread with bounded queues, and
+# sync/cleanup move to a background maintenance thread.
+PIPELINE_MODE: bool = False
+PIPELINE_QUEUE_SIZE: int = 64            # per-stage queue bound
+PIPELINE_MAX_FRAME_AGE_SEC: float = 60.0  # frames older than this are dropped
+
+# --- SQLite writer (db.py) ---
+DB_WRITER_BATCH_MAX: int = 500   # max queued writes committed together
+DB_WRITER_LINGER_MS: int = 20    # wait this long for more writes before commit
+
+# Parallel uploads in one sync pass (also the HTTP connection-pool size)
+SYNC_CONCURRENCY: int = 4
+
+# --- bulk upload (many rows per request) ---
+# None = one row per request. Set it only for a server that has the bulk
+# endpoint (EdgeDataController has none yet: API_URL + "/batch" is a 404)
+SYNC_BULK_URL: str | None = None
+SYNC_BULK_MAX_BYTES: int = 8_000_000   # payload budget per bulk request
+SYNC_BULK_REPROBE_SEC: int = 3600      # retry bulk this long after the server refused it
+
+# Retention cleanup works in chunks: at most this many rows per tick, and
+# while a backlog remains the next chunk runs CLEANUP_CHUNK_PAUSE_SEC later
+CLEANUP_CHUNK_ROWS: int = 500
+CLEANUP_CHUNK_PAUSE_SEC: float = 2.0
+
+# --- change gate: skip inference on static scenes (motion.py) ---
+# Per camera, "motionGate" on the camera record overrides this default.
+MOTION_GATE_ENABLED: bool = False
+MOTION_DIFF_THRESHOLD: float = 0.02   # mean abs diff (0..1) of 64x36 gray thumbnails
+MOTION_MAX_REUSE_SEC: int = 3600      # force a real inference at least this often
+
+# --- frame encoding (encode.py); camera records may override per camera ---
+ENCODE_FORMAT: str = "jpg"                  # "jpg" or "webp"
+ENCODE_QUALITY: int = 85                    # JPEG / WebP quality (0-100)
+ENCODE_STORE_MAX_WIDTH: int | None = None   # downscale stored frames (None = native)
+ENCODE_UPLOAD_MAX_WIDTH: int | None = None  # downscale again for upload (None = as stored)
+
+# "image":    draw boxes and store/upload a second ANNOTATED frame (classic)
+# "metadata": store/upload only RAW; boxes stay in meta["detections"] and
+#             render.py draws annotated copies on demand (cached)
+ANNOTATION_MODE: str = "image"
+
+# --- inference backend (backends.py) ---
+# "auto" tries OpenVINO, then ONNX Runtime, then the .pt weights.
+# Exported models are cached next to MODEL_NAME.
+INFERENCE_BACKEND: str = "auto"     # "auto" | "openvino" | "onnx" | "pt"
+INFERENCE_INT8: bool = False        # OpenVINO INT8, calibrated on stored frames
+INFERENCE_CALIB_IMAGES: int = 200   # RAW frames sampled for INT8 calibration
+
+# --- local Prometheus-style /metrics endpoint (metrics.py) ---
+METRICS_PORT: int | None = None     # e.g. 9108; None = no HTTP endpoint
+METRICS_BIND: str = "0.0.0.0"
+
+# --- on-demand profiling (profiling.py): SIGUSR1 or touch PROFILE_TRIGGER_FILE ---
+DIAG_DIR: str = "diagnostics"
+PROFILE_SECONDS: int = 30                  # default window length
+PROFILE_MODE: str = "cprofile"             # "cprofile" (main loop) | "sample" (all threads)
+PROFILE_SAMPLE_INTERVAL_MS: int = 10
+PROFILE_TRIGGER_FILE: str | None = "diagnostics/profile.trigger"
+PROFILE_TRACEMALLOC: bool = False          # also diff tracemalloc snapshots over the window
+
+# --- detection schedule (scheduler.py); camera records may override ---
+# Replaces the fixed Toronto day/night cadence; cameras are phase-staggered.
+SCHEDULE_TIMEZONE: str = "America/Toronto"
+SCHEDULE_DAY_START_HOUR: float = 6           # local time, inclusive
+SCHEDULE_DAY_END_HOUR: float = 18            # local time, exclusive
+SCHEDULE_DAY_INTERVAL_SEC: int = 5 * 60
+SCHEDULE_NIGHT_INTERVAL_SEC: int = 60 * 60
+
+# --- edge-side rollups (rollup.py): upload window aggregates, not every row ---
+ROLLUP_ENABLED: bool = False
+ROLLUP_WINDOW_SEC: int = 15 * 60
+# the server must provide this route (EdgeDataController has none yet)
+ROLLUP_URL: str = API_URL + "/rollups"       # POST JSON {"rollups": [...]}
+ROLLUP_MAX_WINDOWS: int = 50                 # closed windows per request
+# which rows still upload their frames:
+# "detections" | "first_per_window" | "detections_or_first" | "all" | "none"
+ROLLUP_FRAME_POLICY: str = "detections_or_first"
+
+# --- meta encoding (metacodec.py) ---
+# "json": plain JSON (compatible default); "packed": versioned columnar
+# binary (zlib + base64 text) -- several times smaller on busy scenes
+META_FORMAT: str = "json"          # how meta_json is stored in the DB
+META_UPLOAD_FORMAT: str = "json"   # what the server receives ("packed" needs server support)
+
+# --- normalized detections table (db.py, queried by query.py) ---
+# one indexed row per detection, written with its snapshot row
+DETECTIONS_INDEX_ENABLED: bool = True
+HEARTBEAT_DETECTIONS_WINDOW_SEC: int = 60 * 60  # per-class totals sent with the heartbeat
+
+# --- bounded offline spool (spool.py): frames/ + DB under a byte budget ---
+# over budget, frame files are evicted (rows are kept, see spool_drops)
+SPOOL_MAX_BYTES: int | None = 8 * 1024 ** 3  # size for the device's eMMC; None = unbounded
+SPOOL_LOW_WATER: float = 0.9                 # evict down to this share of the budget
+SPOOL_CHECK_EVERY_SEC: int = 60
+SPOOL_EVICT_CHUNK: int = 200                 # rows per eviction query / commit
+
+# --- frames/ size index + orphan reconciliation (diskusage.py) ---
+RECONCILE_EVERY_SEC: int = 5 * 60          # one past day directory per pass
+RECONCILE_GRACE_SEC: int = 60 * 60         # unreferenced files younger than this are left alone
+# False = only count them; never deletes while DELETE_OLD_FRAMES is False
+RECONCILE_DELETE_ORPHANS: bool = DELETE_OLD_FRAMES
@@ -1,13 +1,183 @@
+"""
+Local SQLite store.
+
+- WAL journal, so readers never block the writer (and vice versa).
+- All writes go through one long-lived writer thread (_Writer) that
+  group-commits whatever is queued in a single transaction.
+- Each reading thread (main loop, heartbeat, sync) keeps its own
+  persistent connection (_reader()).
+"""
+
 import os
+import queue
 import sqlite3
-from datetime import datetime, timedelta
-from typing import List, Tuple, Optional
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Tuple, Optional
+
+from colorama import Fore, Style
+
+from config import (
+    DB_NAME, RETENTION_DAYS, DELETE_OLD_FRAMES,
+    DB_WRITER_BATCH_MAX, DB_WRITER_LINGER_MS, CLEANUP_CHUNK_ROWS,
+    ROLLUP_ENABLED, ROLLUP_WINDOW_SEC, DETECTIONS_INDEX_ENABLED,
+)
+import metrics
+import rollup
+
+
+def db_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+# ------------------ connections ------------------
+
+def _connect() -> sqlite3.Connection:
+    con = sqlite3.connect(DB_NAME, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL;")
+    # WAL + NORMAL: durable across app crashes, fsync only at checkpoints
+    con.execute("PRAGMA synchronous=NORMAL;")
+    con.execute("PRAGMA cache_size=-8000;")   # ~8 MB page cache
+    con.execute("PRAGMA temp_store=MEMORY;")
+    con.execute("PRAGMA busy_timeout=5000;")
+    return con
+
+
+_local = threading.local()
+
+
+def _reader() -> sqlite3.Connection:
+    """Persistent read connection owned by the calling thread."""
+    con = getattr(_local, "con", None)
+    if con is None:
+        con = _connect()
+        _local.con = con
+    return con
+
+
+def read_connection() -> sqlite3.Connection:
+    """The calling thread's read connection, for read-only modules (query.py)."""
+    return _reader()
+
+
+class _Pending:
+    """Handle for one queued write; wait() returns its result."""
+
+    def __init__(self, waited: bool = True, camera: Optional[str] = None):
+        # nobody waits on fire-and-forget writes, so the writer logs their errors
+        self.waited = waited
+        # camera rows report queue -> commit latency to metrics.DB_WRITE_SECONDS
+        self.camera = camera
+        self.queued_at = time.perf_counter()
+        self._done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def set(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        self.result = result
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        if not self._done.wait(timeout):
+            raise TimeoutError("DB write not committed in time")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class _Writer(threading.Thread):
+    """Single writer: drains the queue and commits it as one transaction."""
+
+    def __init__(self):
+        super().__init__(daemon=True, name="db-writer")
+        self.q: "queue.Queue[Tuple[Callable[[sqlite3.Cursor], Any], _Pending]]" = queue.Queue()
+
+    def run(self):
+        con = _connect()
+        con.isolation_level = None  # explicit BEGIN/COMMIT below
+        cur = con.cursor()
+        linger = DB_WRITER_LINGER_MS / 1000.0
+
+        while True:
+            batch = [self.q.get()]
+            # short linger so bursts (one row per camera) share a commit
+            try:
+                while len(batch) < DB_WRITER_BATCH_MAX:
+                    batch.append(self.q.get(timeout=linger))
+            except queue.Empty:
+                pass
+
+            results = []
+            t0 = time.perf_counter()
+            try:
+                cur.execute("BEGIN IMMEDIATE;")
+                for fn, pending in batch:
+                    # savepoint per op: one bad statement doesn't sink the batch
+                    cur.execute("SAVEPOINT op;")
+                    try:
+                        results.append((pending, fn(cur), None))
+                        cur.execute("RELEASE op;")
+                    except Exception as e:
+                        cur.execute("ROLLBACK TO op;")
+                        cur.execute("RELEASE op;")
+                        results.append((pending, None, e))
+                cur.execute("COMMIT;")
+                done = time.perf_counter()
+                metrics.DB_COMMIT_SECONDS.observe(done - t0)
+                for _, pending in batch:
+                    if pending.camera is not None:
+                        metrics.DB_WRITE_SECONDS.observe(
+                            done - pending.queued_at, camera=pending.camera)
+            except Exception as e:
+                db_warn(f"[DB] write batch failed: {e}")
+                try:
+                    cur.execute("ROLLBACK;")
+                except Exception:
+                    pass
+                results = [(p, None, e) for _, p in batch]
+
+            for pending, result, error in results:
+                if error is not None and not pending.waited:
+                    db_warn(f"[DB] write failed: {error}")
+                pending.set(result, error)
+
 
-from config import DB_NAME, RETENTION_DAYS, DELETE_OLD_FRAMES
+_writer: Optional[_Writer] = None
+_writer_lock = threading.Lock()
 
 
+def _submit(fn: Callable[[sqlite3.Cursor], Any], wait: bool = True,
+            camera: Optional[str] = None) -> Any:
+    """Queue a write for the writer thread; optionally block until committed."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = _Writer()
+                _writer.start()
+
+    pending = _Pending(waited=wait, camera=camera)
+    _writer.q.put((fn, pending))
+    return pending.wait() if wait else None
+
+
+def flush_db(timeout: float = 10.0) -> None:
+    """Block until everything queued so far is committed (call on shutdown)."""
+    if _writer is None:
+        return
+    pending = _Pending()
+    _writer.q.put((lambda cur: None, pending))
+    try:
+        pending.wait(timeout)
+    except Exception as e:
+        db_warn(f"[DB] flush failed: {e}")
+
+
+# ------------------ schema ------------------
+
 def init_db() -> None:
-    con = sqlite3.connect(DB_NAME)
+    con = _connect()
     cur = con.cursor()
     cur.execute("""
     CREATE TABLE IF NOT EXISTS people_count (
@@ -22,12 +192,19 @@ def init_db() -> None:
         missing_files INTEGER NOT NULL DEFAULT 0
     );
     """)
+    # outbox index: only pending rows are in it, so it stays tiny once the
+    # backlog drains (a plain index on synced is almost all 1s)
+    cur.execute("DROP INDEX IF EXISTS idx_pc_synced;")
     cur.execute(
-        "CREATE INDEX IF NOT EXISTS idx_pc_synced ON people_count(synced);"
+        "CREATE INDEX IF NOT EXISTS idx_pc_pending ON people_count(id) WHERE synced=0;"
     )
     cur.execute(
         "CREATE INDEX IF NOT EXISTS idx_pc_created ON people_count(created_at);"
     )
+    # retention cleanup walks (synced=1, created_at < cutoff) as a range scan
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_pc_synced_created ON people_count(synced, created_at);"
+    )
 
     # gentle column adds for older DBs
     for col in ("meta_json", "frame_raw_path", "frame_annotated_path"):
@@ -46,6 +223,98 @@ def init_db() -> None:
         # already exists
         pass
 
+    # per-camera / per-class window aggregates (rollup.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS rollups (
+        camera_id TEXT NOT NULL,
+        window_start INTEGER NOT NULL,
+        class_name TEXT NOT NULL,
+        samples INTEGER NOT NULL,
+        count_sum INTEGER NOT NULL,
+        count_min INTEGER NOT NULL,
+        count_max INTEGER NOT NULL,
+        conf_sum REAL NOT NULL,
+        conf_n INTEGER NOT NULL,
+        synced INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (camera_id, window_start, class_name)
+    );
+    """)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_rollups_pending ON rollups(window_start) WHERE synced=0;"
+    )
+
+    # one row per detection (query.py); ts is epoch seconds of the snapshot
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS detections (
+        id INTEGER PRIMARY KEY,
+        row_id INTEGER NOT NULL,
+        camera_id TEXT NOT NULL,
+        ts REAL NOT NULL,
+        class_id INTEGER,
+        class_name TEXT NOT NULL,
+        confidence REAL,
+        x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+        track_id INTEGER
+    );
+    """)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_det_cam_ts ON detections(camera_id, ts);"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_det_class_ts ON detections(class_name, ts);"
+    )
+    # retention cleanup deletes by parent row
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_det_row ON detections(row_id);"
+    )
+
+    # bounded spool (spool.py): frames evicted from a row (1 = raw,
+    # 2 = annotated) and one record per dropped file
+    try:
+        cur.execute(
+            "ALTER TABLE people_count "
+            "ADD COLUMN frames_dropped INTEGER NOT NULL DEFAULT 0;"
+        )
+    except Exception:
+        # already exists
+        pass
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS spool_drops (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dropped_at TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        camera_id TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        path TEXT,
+        bytes INTEGER NOT NULL,
+        reason TEXT NOT NULL
+    );
+    """)
+
+    # bytes under frames/ per day directory and camera (diskusage.py);
+    # updated with every frame write / delete, corrected by reconciliation
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS disk_usage (
+        day TEXT NOT NULL,
+        camera_id TEXT NOT NULL,
+        files INTEGER NOT NULL,
+        bytes INTEGER NOT NULL,
+        PRIMARY KEY (day, camera_id)
+    );
+    """)
+
+    # per-row retry bookkeeping for sync (attempt count + earliest retry time)
+    for ddl in (
+        "ADD COLUMN sync_attempts INTEGER NOT NULL DEFAULT 0;",
+        "ADD COLUMN next_attempt_at REAL NOT NULL DEFAULT 0;",
+    ):
+        try:
+            cur.execute("ALTER TABLE people_count " + ddl)
+        except Exception:
+            # already exists
+            pass
+
     con.commit()
     con.close()
 
@@ -56,99 +325,507 @@ def store_local(
     meta_json: str,
     frame_raw_path: Optional[str],
     frame_annotated_path: Optional[str],
+    meta: Optional[dict] = None,
 ) -> None:
-    con = sqlite3.connect(DB_NAME)
-    cur = con.cursor()
+    """Queue one row for insert; the writer thread commits it with its batch.
+
+    With ROLLUP_ENABLED the row is also folded into its camera's rollup
+    window (same transaction), and rows the frame policy doesn't pick are
+    stored as ROLLUP_WAIT until that window's rollup is accepted. With DETECTIONS_INDEX_ENABLED its detections
+    are copied into the detections table (same transaction as well).
+    The frames' bytes are added to the disk_usage index in that same
+    transaction. `meta` saves re-parsing meta_json.
+    """
+    now = time.time()
+    created_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    written = [_usage_entry(p, 1, os.path.getsize(p))
+               for p in (frame_raw_path, frame_annotated_path)
+               if p and os.path.isfile(p)]
+
+    def _insert(cur: sqlite3.Cursor) -> None:
+        _usage_delta(cur, written)
+        synced = 0
+        m = rollup.meta_of(meta_json, meta) if ROLLUP_ENABLED or DETECTIONS_INDEX_ENABLED else {}
+        if ROLLUP_ENABLED:
+            first = _accumulate_rollup(cur, camera_id, now, m)
+            synced = 0 if rollup.select_frame(count, first) else ROLLUP_WAIT
+        cur.execute(
+            "INSERT INTO people_count "
+            "(created_at, camera_id, count, meta_json, frame_raw_path, frame_annotated_path, synced, missing_files) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            (
+                created_at,
+                camera_id,
+                count,
+                meta_json,
+                frame_raw_path,
+                frame_annotated_path,
+                synced,
+            ),
+        )
+        if DETECTIONS_INDEX_ENABLED:
+            _index_detections(cur, cur.lastrowid, camera_id, now, m)
+
+    _submit(_insert, wait=False, camera=camera_id)
+
+
+def _index_detections(cur: sqlite3.Cursor, row_id: int, camera_id: str,
+                      ts: float, meta: dict) -> None:
+    rows = []
+    for d in meta.get("detections") or []:
+        box = d.get("bbox_xyxy") or (None, None, None, None)
+        rows.append((row_id, camera_id, ts, d.get("class_id"),
+                     d.get("class_name") or "unknown", d.get("confidence"),
+                     *box[:4], d.get("track_id")))
+    if rows:
+        cur.executemany(
+            "INSERT INTO detections (row_id, camera_id, ts, class_id, class_name, "
+            "confidence, x1, y1, x2, y2, track_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+# people_count.synced of a row the frame policy leaves to its rollup: not
+# uploaded itself, done (synced=1) once its window's rollup is accepted
+ROLLUP_WAIT = 2
+
+
+def _utc_iso(ts: float) -> str:
+    """Epoch -> created_at form (ISO UTC, trailing Z)."""
+    return datetime.utcfromtimestamp(ts).isoformat(timespec="seconds") + "Z"
+
+
+def _accumulate_rollup(cur: sqlite3.Cursor, camera_id: str, ts: float, meta: dict) -> bool:
+    """Fold one sample into rollups; True if it opened a new camera window."""
+    start = rollup.window_start(ts, ROLLUP_WINDOW_SEC)
     cur.execute(
-        "INSERT INTO people_count "
-        "(created_at, camera_id, count, meta_json, frame_raw_path, frame_annotated_path, synced, missing_files) "
-        "VALUES (?, ?, ?, ?, ?, ?, 0, 0)",
-        (
-            datetime.utcnow().isoformat(timespec="seconds") + "Z",
-            camera_id,
-            count,
-            meta_json,
-            frame_raw_path,
-            frame_annotated_path,
-        ),
+        "SELECT 1 FROM rollups WHERE camera_id=? AND window_start=? AND class_name=?",
+        (camera_id, start, rollup.ALL),
     )
-    con.commit()
-    con.close()
+    first = cur.fetchone() is None
+    cur.executemany(
+        "INSERT INTO rollups (camera_id, window_start, class_name, samples, count_sum, "
+        "count_min, count_max, conf_sum, conf_n) VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (camera_id, window_start, class_name) DO UPDATE SET "
+        "samples = samples + 1, count_sum = count_sum + excluded.count_sum, "
+        "count_min = MIN(count_min, excluded.count_min), "
+        "count_max = MAX(count_max, excluded.count_max), "
+        "conf_sum = conf_sum + excluded.conf_sum, conf_n = conf_n + excluded.conf_n",
+        [(camera_id, start, cls, n, n, n, conf_sum, conf_n)
+         for cls, (n, conf_sum, conf_n) in rollup.class_stats(meta).items()],
+    )
+    return first
+
+
+def get_closed_rollups(now: float, limit_windows: int) -> List[tuple]:
+    """Accumulator rows of pending windows that have ended (oldest first)."""
+    cur = _reader().cursor()
+    cur.execute(
+        "SELECT camera_id, window_start, class_name, samples, count_sum, count_min, "
+        "count_max, conf_sum, conf_n FROM rollups "
+        "WHERE synced=0 AND window_start IN ("
+        "  SELECT DISTINCT window_start FROM rollups WHERE synced=0 AND window_start <= ? "
+        "  ORDER BY window_start LIMIT ?) "
+        "ORDER BY window_start, camera_id",
+        (now - ROLLUP_WINDOW_SEC, limit_windows),
+    )
+    return cur.fetchall()
+
+
+def mark_rollups_synced(windows: List[Tuple[str, int]]) -> int:
+    """Mark (camera_id, window_start) rollups as uploaded, and the
+    ROLLUP_WAIT rows of those windows as synced."""
+    if not windows:
+        return 0
+
+    def _update(cur: sqlite3.Cursor) -> int:
+        cur.executemany(
+            "UPDATE rollups SET synced=1 WHERE camera_id=? AND window_start=?",
+            windows,
+        )
+        changed = cur.rowcount
+        # range scans on idx_pc_synced_created
+        cur.executemany(
+            "UPDATE people_count SET synced=1 WHERE synced=? AND camera_id=? "
+            "AND created_at >= ? AND created_at < ?",
+            [(ROLLUP_WAIT, cam, _utc_iso(start), _utc_iso(start + ROLLUP_WINDOW_SEC))
+             for cam, start in windows],
+        )
+        return changed
+
+    return _submit(_update)
 
 
 def get_unsynced_rows(
     limit: int,
 ) -> List[Tuple[int, str, str, int, Optional[str], Optional[str], Optional[str]]]:
-    con = sqlite3.connect(DB_NAME)
-    cur = con.cursor()
+    """Pending rows whose per-row retry delay (if any) has passed."""
+    cur = _reader().cursor()
     cur.execute(
         "SELECT id, created_at, camera_id, count, meta_json, frame_raw_path, frame_annotated_path "
-        "FROM people_count WHERE synced=0 ORDER BY id ASC LIMIT ?",
-        (limit,),
+        "FROM people_count WHERE synced=0 AND next_attempt_at <= ? ORDER BY id ASC LIMIT ?",
+        (time.time(), limit),
     )
-    rows = cur.fetchall()
-    con.close()
-    return rows
+    return cur.fetchall()
 
 
-def mark_synced(row_id: int) -> None:
-    con = sqlite3.connect(DB_NAME)
-    cur = con.cursor()
+def count_unsynced() -> int:
+    """Size of the upload backlog (served by the partial idx_pc_pending index)."""
+    cur = _reader().cursor()
+    cur.execute("SELECT COUNT(*) FROM people_count WHERE synced=0")
+    return int(cur.fetchone()[0])
+
+
+# stay well below SQLITE_MAX_VARIABLE_NUMBER on older builds
+_IN_CHUNK = 500
+
+
+def _update_ids(sql: str, row_ids: List[int], params: Tuple = ()) -> int:
+    """Run `sql` (with an {ids} placeholder list) for all ids in one transaction.
+
+    `params` bind the placeholders that come before {ids}.
+    """
+    ids = list(row_ids)
+    if not ids:
+        return 0
+
+    def _update(cur: sqlite3.Cursor) -> int:
+        changed = 0
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i:i + _IN_CHUNK]
+            cur.execute(sql.format(ids=",".join("?" * len(chunk))),
+                        (*params, *chunk))
+            changed += cur.rowcount
+        return changed
+
+    return _submit(_update)
+
+
+def mark_synced_many(row_ids: List[int], missing_files: bool = False) -> int:
+    """Set synced=1 (and optionally missing_files=1) for all ids in one commit."""
+    if missing_files:
+        sql = "UPDATE people_count SET synced=1, missing_files=1 WHERE id IN ({ids})"
+    else:
+        sql = "UPDATE people_count SET synced=1 WHERE id IN ({ids})"
+    return _update_ids(sql, row_ids)
+
+
+def mark_missing_files_many(row_ids: List[int]) -> int:
+    """Set missing_files=1 for all ids in one commit."""
+    return _update_ids(
+        "UPDATE people_count SET missing_files=1 WHERE id IN ({ids})", row_ids)
+
+
+def get_row(
+    row_id: int,
+) -> Optional[Tuple[int, str, str, int, Optional[str], Optional[str], Optional[str]]]:
+    """One row in the same shape as get_unsynced_rows."""
+    cur = _reader().cursor()
     cur.execute(
-        "UPDATE people_count SET synced=1 WHERE id=?",
+        "SELECT id, created_at, camera_id, count, meta_json, frame_raw_path, frame_annotated_path "
+        "FROM people_count WHERE id=?",
         (row_id,),
     )
-    con.commit()
-    con.close()
+    return cur.fetchone()
+
+
+def mark_failed_many(row_ids: List[int], backoff_start: float, backoff_max: float) -> int:
+    """Count a failed upload per row and push its next attempt out exponentially."""
+    return _update_ids(
+        "UPDATE people_count SET "
+        "sync_attempts = sync_attempts + 1, "
+        "next_attempt_at = ? + min(?, ? * (1 << min(sync_attempts, 16))) "
+        "WHERE id IN ({ids})",
+        row_ids,
+        (time.time(), float(backoff_max), float(backoff_start)),
+    )
+
+
+def mark_synced(row_id: int) -> None:
+    mark_synced_many([row_id])
 
 
 def mark_missing_files(row_id: int) -> None:
     """Set missing_files=1 for this row so we know images were not found at sync time."""
-    con = sqlite3.connect(DB_NAME)
-    cur = con.cursor()
-    cur.execute(
-        "UPDATE people_count SET missing_files=1 WHERE id=?",
-        (row_id,),
-    )
-    con.commit()
-    con.close()
+    mark_missing_files_many([row_id])
 
 
-def _safe_del(path: Optional[str]) -> None:
-    if not path:
-        return
+# ------------------ frames/ size index (diskusage.py) ------------------
+
+def frame_key(path: str) -> Tuple[str, str]:
+    """frames/<day>/<camera>_<ts>_<suffix>.<ext> -> (day, camera)."""
+    day = os.path.basename(os.path.dirname(path)) or "unknown"
+    parts = os.path.basename(path).rsplit("_", 2)
+    return day, (parts[0] if len(parts) == 3 else "unknown")
+
+
+def _usage_entry(path: str, files: int, size: int) -> Tuple[str, str, int, int]:
+    return (*frame_key(path), files, size)
+
+
+def _usage_delta(cur: sqlite3.Cursor, entries: List[Tuple[str, str, int, int]]) -> None:
+    """Add (day, camera, files, bytes) deltas to disk_usage."""
+    if entries:
+        cur.executemany(
+            "INSERT INTO disk_usage (day, camera_id, files, bytes) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (day, camera_id) DO UPDATE SET "
+            "files = MAX(0, files + excluded.files), bytes = MAX(0, bytes + excluded.bytes)",
+            entries,
+        )
+
+
+def _unlink(path: Optional[str]) -> Optional[Tuple[str, str, int, int]]:
+    """Delete one frame file; returns its negative usage delta (None if nothing was removed)."""
+    if not path or not os.path.isfile(path):
+        return None
     try:
-        if os.path.isfile(path):
-            os.remove(path)
-    except Exception:
-        pass
+        size = os.path.getsize(path)
+        os.remove(path)
+    except OSError as e:
+        db_warn(f"[DB] could not delete {path}: {e}")
+        return None
+    return _usage_entry(path, -1, -size)
 
 
-def cleanup_old_synced(retention_days: int = RETENTION_DAYS) -> int:
-    cutoff = datetime.utcnow() - timedelta(days=retention_days)
-    cutoff_iso = cutoff.isoformat(timespec="seconds") + "Z"
+def remove_files(paths: List[Optional[str]]) -> int:
+    """Delete frame files now and take them off the index; returns bytes removed."""
+    deltas = [d for d in map(_unlink, paths) if d is not None]
+    if deltas:
+        _submit(lambda cur: _usage_delta(cur, deltas), wait=False)
+    return -sum(d[3] for d in deltas)
 
-    con = sqlite3.connect(DB_NAME)
-    cur = con.cursor()
 
-    if DELETE_OLD_FRAMES:
-        cur.execute(
-            "SELECT frame_raw_path, frame_annotated_path "
-            "FROM people_count WHERE synced=1 AND created_at < ?",
-            (cutoff_iso,),
+def disk_usage_total() -> int:
+    """Indexed bytes under frames/ (one small table; no filesystem walk)."""
+    cur = _reader().cursor()
+    cur.execute("SELECT COALESCE(SUM(bytes), 0) FROM disk_usage")
+    return int(cur.fetchone()[0])
+
+
+# marker row (day='', 0 bytes): the full index build has run once
+_USAGE_BUILT = ""
+
+
+def disk_usage_by_camera() -> dict:
+    """{camera: bytes} over all day directories."""
+    cur = _reader().cursor()
+    cur.execute("SELECT camera_id, SUM(bytes) FROM disk_usage WHERE day != ? "
+                "GROUP BY camera_id", (_USAGE_BUILT,))
+    return {cam: int(n) for cam, n in cur.fetchall()}
+
+
+def disk_usage_days() -> List[str]:
+    cur = _reader().cursor()
+    cur.execute("SELECT DISTINCT day FROM disk_usage WHERE day != ? ORDER BY day",
+                (_USAGE_BUILT,))
+    return [r[0] for r in cur.fetchall()]
+
+
+def disk_usage_built() -> bool:
+    cur = _reader().cursor()
+    cur.execute("SELECT 1 FROM disk_usage WHERE day = ?", (_USAGE_BUILT,))
+    return cur.fetchone() is not None
+
+
+def mark_disk_usage_built() -> None:
+    _submit(lambda cur: cur.execute(
+        "INSERT OR IGNORE INTO disk_usage (day, camera_id, files, bytes) VALUES (?, ?, 0, 0)",
+        (_USAGE_BUILT, _USAGE_BUILT)))
+
+
+def replace_disk_usage(day: str, per_camera: dict) -> None:
+    """Overwrite the index rows of one day with measured {camera: (files, bytes)}."""
+    def _replace(cur: sqlite3.Cursor) -> None:
+        cur.execute("DELETE FROM disk_usage WHERE day=?", (day,))
+        cur.executemany(
+            "INSERT INTO disk_usage (day, camera_id, files, bytes) VALUES (?, ?, ?, ?)",
+            [(day, cam, files, size) for cam, (files, size) in per_camera.items()],
         )
-        for raw, ann in cur.fetchall():
-            _safe_del(raw)
-            _safe_del(ann)
 
+    _submit(_replace)
+
+
+def get_frame_names_between(start_iso: str, end_iso: str) -> set:
+    """Base names of frame files referenced by rows created in [start, end)."""
+    cur = _reader().cursor()
     cur.execute(
-        "DELETE FROM people_count WHERE synced=1 AND created_at < ?",
-        (cutoff_iso,),
+        "SELECT frame_raw_path, frame_annotated_path FROM people_count "
+        "WHERE created_at >= ? AND created_at < ?",
+        (start_iso, end_iso),
     )
-    deleted = cur.rowcount
-    con.commit()
-    con.close()
-    return deleted
+    return {os.path.basename(p) for row in cur.fetchall() for p in row if p}
+
+
+# ------------------ spool eviction (spool.py) ------------------
+
+DROPPED_RAW = 1
+DROPPED_ANNOTATED = 2
+
+# eviction tiers, cheapest loss first; every query walks ids after a cursor
+_SPOOL_TIERS = {
+    # uploaded or left to the rollup (ROLLUP_WAIT): the local copy is all that goes
+    "synced": "synced!=0 AND (frame_raw_path IS NOT NULL OR frame_annotated_path IS NOT NULL)",
+    # pending annotated copy: render.py redraws it from RAW + meta
+    "annotated": "synced=0 AND frame_annotated_path IS NOT NULL",
+    # pending RAW, nothing detected: the row is given up (see record_spool_drops)
+    "empty": "synced=0 AND count=0 AND frame_raw_path IS NOT NULL",
+    # pending RAW with detections, oldest first; given up as well
+    "oldest": "synced=0 AND frame_raw_path IS NOT NULL",
+}
+SPOOL_TIERS = tuple(_SPOOL_TIERS)
+
+
+def get_spool_candidates(
+    tier: str, after_id: int, limit: int,
+) -> List[Tuple[int, str, str, Optional[str], Optional[str]]]:
+    """(id, camera_id, created_at, raw, annotated) of rows in an eviction tier."""
+    cur = _reader().cursor()
+    cur.execute(
+        "SELECT id, camera_id, created_at, frame_raw_path, frame_annotated_path "
+        f"FROM people_count WHERE {_SPOOL_TIERS[tier]} AND id > ? ORDER BY id LIMIT ?",
+        (after_id, limit),
+    )
+    return cur.fetchall()
+
+
+def record_spool_drops(drops: List[Tuple[int, str, str, str, str, int, str]]) -> int:
+    """Detach evicted frames from their rows and log them, in one commit.
+
+    drops: (row_id, camera_id, created_at, kind "raw"|"annotated", path,
+    bytes, reason). The row itself (meta) is kept. The server requires
+    RAW, so a pending row that loses it can never upload: it is closed as
+    synced=1, missing_files=1 instead of being retried forever.
+    """
+    if not drops:
+        return 0
+    dropped_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+    def _record(cur: sqlite3.Cursor) -> int:
+        for row_id, _, _, kind, _, _, _ in drops:
+            if kind == "raw":
+                cur.execute(
+                    "UPDATE people_count SET frame_raw_path=NULL, "
+                    "missing_files = CASE WHEN synced=0 THEN 1 ELSE missing_files END, "
+                    "synced = CASE WHEN synced=0 THEN 1 ELSE synced END, "
+                    "frames_dropped = frames_dropped | ? WHERE id=?",
+                    (DROPPED_RAW, row_id))
+            else:
+                cur.execute(
+                    "UPDATE people_count SET frame_annotated_path=NULL, "
+                    "frames_dropped = frames_dropped | ? WHERE id=?",
+                    (DROPPED_ANNOTATED, row_id))
+        cur.executemany(
+            "INSERT INTO spool_drops (dropped_at, row_id, camera_id, created_at, "
+            "kind, path, bytes, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(dropped_at, *d) for d in drops],
+        )
+        return len(drops)
+
+    return _submit(_record)
+
+
+def clear_frame_paths(row_ids: List[int], kind: str) -> int:
+    """Forget frame paths whose files are gone ("raw" or "annotated"), so
+    spool tiers and sync stop looking at them. Not a spool drop."""
+    col = "frame_raw_path" if kind == "raw" else "frame_annotated_path"
+    return _update_ids(f"UPDATE people_count SET {col}=NULL WHERE id IN ({{ids}})", row_ids)
+
+
+class _FileReaper(threading.Thread):
+    """Low-priority background unlinker for frames of deleted rows."""
+
+    def __init__(self):
+        super().__init__(daemon=True, name="file-reaper")
+        self.q: "queue.Queue[Optional[str]]" = queue.Queue()
+
+    def run(self):
+        try:
+            # Linux: per-thread nice value, so unlinking yields to detection
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except Exception:
+            pass
+        while True:
+            deltas = [_unlink(self.q.get())]
+            # everything already queued shares one index update
+            try:
+                while len(deltas) < DB_WRITER_BATCH_MAX:
+                    deltas.append(_unlink(self.q.get_nowait()))
+            except queue.Empty:
+                pass
+            deltas = [d for d in deltas if d is not None]
+            if deltas:
+                _submit(lambda cur, d=deltas: _usage_delta(cur, d), wait=False)
+
+
+_reaper: Optional[_FileReaper] = None
+
+
+def delete_files_async(paths: List[Optional[str]]) -> None:
+    """Hand frame files to the background reaper (never blocks the caller)."""
+    global _reaper
+    if _reaper is None:
+        with _writer_lock:
+            if _reaper is None:
+                _reaper = _FileReaper()
+                _reaper.start()
+    for path in paths:
+        if path:
+            _reaper.q.put(path)
+
+
+# DELETE ... RETURNING needs SQLite 3.35+ (older Jetson images ship 3.31)
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def cleanup_old_synced(retention_days: int = RETENTION_DAYS,
+                       limit: int = CLEANUP_CHUNK_ROWS) -> int:
+    """Delete one chunk (at most `limit`) of expired synced rows.
+
+    ROLLUP_WAIT rows and rollups the server never accepted expire too, so
+    a missing rollup endpoint can't grow the DB without bound. Each chunk is a range scan on idx_pc_synced_created and one short
+    writer transaction; frame files go to the background reaper. Returns
+    the number of rows deleted (== limit means more are waiting).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    cutoff_iso = cutoff.isoformat(timespec="seconds") + "Z"
+    chunk_sql = (
+        f"SELECT id FROM people_count WHERE synced IN (1, {ROLLUP_WAIT}) AND created_at < ? "
+        "ORDER BY created_at LIMIT ?"
+    )
+
+    def _delete(cur: sqlite3.Cursor) -> list:
+        if _HAS_RETURNING:
+            cur.execute(
+                f"DELETE FROM people_count WHERE id IN ({chunk_sql}) "
+                "RETURNING id, frame_raw_path, frame_annotated_path",
+                (cutoff_iso, limit),
+            )
+            rows = cur.fetchall()
+        else:
+            cur.execute(
+                "SELECT id, frame_raw_path, frame_annotated_path FROM people_count "
+                f"WHERE id IN ({chunk_sql})",
+                (cutoff_iso, limit),
+            )
+            rows = cur.fetchall()
+            cur.executemany("DELETE FROM people_count WHERE id=?",
+                            [(r[0],) for r in rows])
+        # rows indexed while DETECTIONS_INDEX_ENABLED was on still have children
+        cur.executemany("DELETE FROM detections WHERE row_id=?",
+                        [(r[0],) for r in rows])
+        return [r[1:] for r in rows]
+
+    paths = _submit(_delete)
+    _submit(lambda cur: cur.execute(
+        "DELETE FROM spool_drops WHERE dropped_at < ?", (cutoff_iso,)), wait=False)
+    if ROLLUP_ENABLED:
+        _submit(lambda cur: cur.execute(
+            "DELETE FROM rollups WHERE window_start < ?",
+            (cutoff.replace(tzinfo=timezone.utc).timestamp(),)), wait=False)
+
+    if DELETE_OLD_FRAMES:
+        delete_files_async([p for raw_ann in paths for p in raw_ann])
+    return len(paths)
 
 
 def get_last_capture_utc() -> Optional[datetime]:
@@ -156,8 +833,7 @@ def get_last_capture_utc() -> Optional[datetime]:
     Returns the most recent created_at timestamp from people_count
     as a timezone-aware UTC datetime.
     """
-    con = sqlite3.connect(DB_NAME)
-    cur = con.cursor()
+    cur = _reader().cursor()
     cur.execute(
         """
         SELECT created_at
@@ -167,7 +843,6 @@ def get_last_capture_utc() -> Optional[datetime]:
         """
     )
     row = cur.fetchone()
-    con.close()
 
     if not row or not row[0]:
         return None
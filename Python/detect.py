@@ -1,11 +1,16 @@
 """
 YOLOv11 detection + tracking, with dynamic target classes fetched from your API.
 
-- Reads TEST_FRAME_PATH (local image) or grabs one RTSP frame.
-- Fetches target class names from REMOTE_TARGETS_URL (cached TTL).
+- Reads TEST_FRAME_PATH (local image) or takes the latest RTSP frame
+  (from the persistent reader in capture.py; a one-shot open only when no
+  reader runs for the camera, so a reconnecting camera is skipped instead).
+- Target class names from REMOTE_TARGETS_URL, refreshed in the background
+  (refresher.py; the last good list is kept if the API fails).
 - Maps class names -> YOLO class IDs (e.g., "person" -> 0).
-- Runs model.track(classes=[...]) using those IDs.
-- Saves RAW and (if any detections) ANNOTATED frames.
+- Runs model.track(classes=[...]) using those IDs (detect_one), or one
+  batched model.predict across all due cameras (detect_many).
+- Saves RAW and (if any detections, ANNOTATION_MODE="image") ANNOTATED
+  frames, encoded per camera (format / quality / width, see encode.py).
 - Returns (count, raw_path, annotated_path, meta).
 """
 
@@ -16,85 +21,85 @@ from typing import Any, Dict, Tuple, Optional, List
 import json
 import cv2
 import numpy as np
-import requests
 from ultralytics import YOLO
 
 from config import (
     FRAME_ROOT, FRAME_WIDTH, FRAME_HEIGHT, MODEL_NAME, TEST_FRAME_PATH,
-    REMOTE_TARGETS_URL, REMOTE_TARGETS_TTL_SEC, REQUESTS_VERIFY_TLS,
-    DETECTION_ENABLED,
+    REMOTE_TARGETS_URL, REMOTE_TARGETS_TTL_SEC,
+    DETECTION_ENABLED, CAPTURE_PERSISTENT, CAPTURE_WAIT_FRESH_SEC, DETECT_BATCH_SIZE,
+    ANNOTATION_MODE,
 )
+import capture
+# Inferred = (dets, inference_ms, targets, reused); reused=True means the
+# change gate skipped YOLO and repeated the camera's last result
+from motion import gate, gate_enabled, Inferred
+from encode import encode_image, encode_settings
+from render import draw_annotations
+from backends import load_model
+from roi import crop_to_roi, map_to_frame
+from refresher import RemoteSnapshot, refresher
+import metrics
 
 # ------------------ model (lazy) ------------------
 _MODEL: YOLO | None = None
+_MODEL_BACKEND: str = "pt"
 
 
 def _get_model() -> YOLO:
-    global _MODEL
+    global _MODEL, _MODEL_BACKEND
     if _MODEL is None:
-        _MODEL = YOLO(MODEL_NAME)  # auto-downloads on first use
+        # fastest installed backend (OpenVINO / ONNX Runtime), else .pt
+        _MODEL, _MODEL_BACKEND = load_model()
     return _MODEL
 
 
 # ------------------ targets cache ------------------
 
-_targets_cache: Dict[str, Any] = {
-    "expires_at": 0.0,
-    "default": ["person"],   # fallback if API not reachable
-    "by_camera": {},         # cam_id -> [targets]
-}
+# fallback until the API has answered (or if it never does)
+_DEFAULT_TARGETS: Dict[str, Any] = {"default": ["person"], "by_camera": {}}
 
 
-def _now() -> float:
-    return time.time()
+def _parse_targets(data: Any) -> Dict[str, Any]:
+    """REMOTE_TARGETS_URL payload (ApiResponse<List<DetectTargetResponse>>) -> targets snapshot."""
+    # Accept either { "targets": [...] } or wrapped in ApiResponse { "data": {...} }
+    if isinstance(data, dict) and "data" in data:
+        data = data["data"]
 
+    default = data.get("default") or data.get("targets") or ["all"]
+    cams = data.get("cameras") or []
 
-def _fetch_targets() -> None:
-    """Fill _targets_cache from REMOTE_TARGETS_URL (ApiResponse<List<DetectTargetResponse>>), with graceful fallbacks."""
-    # Ensure we always move the expiry forward, even if we bail out
-    def _bump_expiry():
-        _targets_cache["expires_at"] = _now() + REMOTE_TARGETS_TTL_SEC
+    by_cam: Dict[str, List[str]] = {}
+    for c in cams:
+        cid = str(c.get("id") or c.get("key") or "").strip()
+        if not cid:
+            continue
+        t = c.get("targets") or default
+        by_cam[cid] = [str(x).lower() for x in t]
 
-    if not REMOTE_TARGETS_URL:
-        _bump_expiry()
-        return
+    return {"default": [str(x).lower() for x in default], "by_camera": by_cam}
 
-    try:
-        r = requests.get(REMOTE_TARGETS_URL, timeout=30,
-                         verify=REQUESTS_VERIFY_TLS)
-        if r.status_code != 200:
-            _bump_expiry()
-            return
-
-        data = r.json()
-        # Accept either { "targets": [...] } or wrapped in ApiResponse { "data": {...} }
-        if isinstance(data, dict) and "data" in data:
-            data = data["data"]
-
-        default = data.get("default") or data.get("targets") or ["all"]
-        cams = data.get("cameras") or []
-
-        by_cam: Dict[str, List[str]] = {}
-        for c in cams:
-            cid = str(c.get("id") or c.get("key") or "").strip()
-            if not cid:
-                continue
-            t = c.get("targets") or default
-            by_cam[cid] = [str(x).lower() for x in t]
-
-        _targets_cache["default"] = [str(x).lower() for x in default]
-        _targets_cache["by_camera"] = by_cam
-        _bump_expiry()
-    except Exception:
-        # On any error: just extend TTL and keep old cache
-        _bump_expiry()
+
+# refreshed in the background (refresher.py); lookups never hit the network
+_targets = RemoteSnapshot("targets", REMOTE_TARGETS_URL, REMOTE_TARGETS_TTL_SEC,
+                          _parse_targets, default=_DEFAULT_TARGETS)
+_targets_watched = False
+
+
+def watch_targets() -> RemoteSnapshot:
+    """Register the targets list with the refresher (idempotent); the agent
+    calls this at startup and waits for the first load, like the cameras."""
+    global _targets_watched
+    if not _targets_watched and REMOTE_TARGETS_URL:
+        refresher.add(_targets)
+        _targets_watched = True
+    return _targets
 
 
 def _get_targets_for_camera(cam_id: str) -> List[str]:
     """Return a list of target class names (lowercase) for this camera."""
-    if _now() >= _targets_cache["expires_at"]:
-        _fetch_targets()
-    return _targets_cache["by_camera"].get(cam_id, _targets_cache["default"])
+    watch_targets()  # standalone use: first lookup starts the background refresh
+    snap = _targets.value
+    return snap["by_camera"].get(cam_id, snap["default"])
 
 # ------------------ utils ------------------
 
@@ -103,20 +108,55 @@ def _ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
 
-def _save_jpg(dir_path: str, cam_id: str, suffix: str, img) -> str:
+def _save_frame(dir_path: str, cam_id: str, suffix: str, img, enc: Dict) -> str:
+    """Encode with this camera's settings (encode.encode_settings) and write it.
+
+    Size / time of the encode are recorded in enc[suffix] for meta["compute"].
+    """
+    t0 = time.perf_counter()
+    data, stats = encode_image(
+        img, enc["format"], enc["quality"], enc["store_max_width"])
     ts = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
-    name = f"{cam_id}_{ts}_{suffix}.jpg"
+    name = f"{cam_id}_{ts}_{suffix}.{enc['format']}"
     path = os.path.join(dir_path, name)
-    cv2.imwrite(path, img)
+    with open(path, "wb") as f:
+        f.write(data)
+    enc[suffix] = stats
+    metrics.ENCODE_SECONDS.observe(time.perf_counter() - t0, camera=cam_id)
     return path
 
 
-def _grab_raw_frame(camera: Dict) -> np.ndarray:
-    import time
-    import cv2
-    import numpy as np
-    from config import FRAME_WIDTH, FRAME_HEIGHT
+def _with_encode(meta: Dict, enc: Dict) -> Dict:
+    meta["compute"]["encode"] = enc
+    return meta
+
 
+def _synthetic_frame() -> np.ndarray:
+    # synthetic fallback (keeps pipeline alive)
+    img = np.zeros((int(FRAME_HEIGHT), int(FRAME_WIDTH), 3), dtype=np.uint8)
+    img[:] = (20, 20, 20)
+    return img
+
+
+def _grab_raw_frame(camera: Dict) -> Optional[np.ndarray]:
+    t0 = time.perf_counter()
+    frame = _grab(camera)
+    metrics.CAPTURE_SECONDS.observe(time.perf_counter() - t0,
+                                    camera=(camera or {}).get("id") or "unknown")
+    return frame
+
+
+def _grab(camera: Dict) -> Optional[np.ndarray]:
+    # Persistent reader running for this camera -> just take its latest frame
+    if CAPTURE_PERSISTENT and capture.manager.has_worker(camera):
+        frame = capture.manager.get_frame(camera, wait=CAPTURE_WAIT_FRESH_SEC)
+        if frame is None:
+            # not connected yet / reconnecting / stale: skip this tick rather
+            # than store a placeholder or open a second session to the camera
+            print(f"[CAPTURE] camera={capture.camera_key(camera)} no fresh frame; skipped this tick")
+        return frame
+
+    # One-shot open / warm-up / close (standalone use, or persistence disabled)
     rtsp = (camera or {}).get("rtsp")
     if rtsp:
         cap = cv2.VideoCapture(rtsp, cv2.CAP_FFMPEG)
@@ -137,24 +177,7 @@ def _grab_raw_frame(camera: Dict) -> np.ndarray:
                 time.sleep(0.02)
         cap.release()
 
-    # synthetic fallback (keeps pipeline alive)
-    img = np.zeros((int(FRAME_HEIGHT), int(FRAME_WIDTH), 3), dtype=np.uint8)
-    img[:] = (20, 20, 20)
-    return img
-
-
-def _draw_anno(img: np.ndarray, dets: List[Dict]) -> np.ndarray:
-    out = img.copy()
-    for d in dets:
-        x1, y1, x2, y2 = map(int, d["bbox_xyxy"])
-        color = (0, 220, 255)
-        cv2.rectangle(out, (x1, y1), (x2, y2), color, 2)
-        label = f'id{d["track_id"]} {d["class_name"]} {d["confidence"]:.2f}'
-        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
-        cv2.rectangle(out, (x1, y1 - th - 4), (x1 + tw, y1), color, -1)
-        cv2.putText(out, label, (x1, y1 - 2),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
-    return out
+    return _synthetic_frame()
 
 
 def _to_meta(cam_id: str, w: int, h: int, dets: List[Dict], inf_ms: float, targets: List[str]) -> Dict:
@@ -173,7 +196,7 @@ def _to_meta(cam_id: str, w: int, h: int, dets: List[Dict], inf_ms: float, targe
         "timestamp_utc": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
         "camera_id": cam_id,
         "image": {"width": int(w), "height": int(h)},
-        "compute": {"inference_ms": float(inf_ms), "model": MODEL_NAME},
+        "compute": {"inference_ms": float(inf_ms), "model": MODEL_NAME, "backend": _MODEL_BACKEND},
         "targets": targets,
         "detections": dets,  # full list – all classes
         "people": {
@@ -221,6 +244,63 @@ def _extract_dets(result, names: Dict[int, str], allowed_ids: Optional[set]) ->
         })
     return dets
 
+def _model_names(model) -> Dict[int, str]:
+    # YOLO name dict: id -> name
+    return model.model.names if hasattr(model, "model") and hasattr(
+        model.model, "names") else model.names
+
+
+def _classes_for_targets(targets: List[str], names: Dict[int, str]) -> Optional[List[int]]:
+    """Map target names to sorted YOLO class IDs (None => detect every class)."""
+    # 1) If "All" (or "*") is present -> no class filter (detect everything)
+    if any(str(t).lower() in ("all", "*") for t in targets):
+        return None
+    # 2) Map target names -> class IDs (case-insensitive)
+    name_to_id = {str(v).lower(): k for k, v in names.items()}
+    wanted_ids = {
+        int(name_to_id[str(t).lower()])
+        for t in targets
+        if str(t).lower() in name_to_id
+    }
+    # None => all (fallback)
+    return sorted(wanted_ids) if wanted_ids else None
+
+
+def _day_dir() -> str:
+    # Folder per day
+    day = datetime.utcnow().strftime("%Y-%m-%d")
+    day_dir = os.path.join(FRAME_ROOT, day)
+    os.makedirs(day_dir, exist_ok=True)
+    return day_dir
+
+
+def _finish(
+    cam_id: str,
+    day_dir: str,
+    raw: np.ndarray,
+    raw_path: str,
+    dets: List[Dict],
+    inf_ms: float,
+    targets: List[str],
+    enc: Dict,
+    reused: bool = False,
+) -> Tuple[int, Optional[str], Optional[str], Dict]:
+    """Save the annotated frame (image mode, fresh detections only) and build meta."""
+    h, w = raw.shape[:2]
+    annotated_path = None
+    if dets and not reused and ANNOTATION_MODE == "image":
+        ann = draw_annotations(raw, dets)
+        annotated_path = _save_frame(day_dir, cam_id, "annotated", ann, enc)
+
+    meta = _with_encode(_to_meta(cam_id, w, h, dets, inf_ms, targets), enc)
+    if ANNOTATION_MODE != "image":
+        # boxes only in meta; render.py draws them on demand
+        meta["annotation"] = "metadata"
+    if reused:
+        meta["reused"] = True
+    metrics.FRAMES_TOTAL.inc(camera=cam_id)
+    return len(dets), raw_path, annotated_path, meta
+
 # ------------------ main entry ------------------
 
 
@@ -238,10 +318,7 @@ def detect_one(camera: Dict) -> Tuple[int, Optional[str], Optional[str], Dict]:
     cam_key = camera.get("key") or camera.get("id") or "unknown"
     cam_id = camera.get("id") or cam_key
 
-    # Folder per day
-    day = datetime.utcnow().strftime("%Y-%m-%d")
-    day_dir = os.path.join(FRAME_ROOT, day)
-    os.makedirs(day_dir, exist_ok=True)
+    day_dir = _day_dir()
 
     # --- Always grab + save RAW frame (pipeline must keep working) ---
     raw = _grab_raw_frame(camera)
@@ -251,11 +328,12 @@ def detect_one(camera: Dict) -> Tuple[int, Optional[str], Optional[str], Dict]:
         return 0, None, None, meta
 
     h, w = raw.shape[:2]
-    raw_path = _save_jpg(day_dir, cam_id, "raw", raw)
+    enc = encode_settings(camera)
+    raw_path = _save_frame(day_dir, cam_id, "raw", raw, enc)
 
     # If detection globally disabled, just return meta with no detections
     if not DETECTION_ENABLED:
-        meta = _to_meta(cam_id, w, h, [], 0.0, [])
+        meta = _with_encode(_to_meta(cam_id, w, h, [], 0.0, []), enc)
         # You can uncomment this if you want to see it in the DB:
         # meta["compute"] = {"detection_enabled": False}
         return 0, raw_path, None, meta
@@ -265,37 +343,39 @@ def detect_one(camera: Dict) -> Tuple[int, Optional[str], Optional[str], Dict]:
         # Targets from API (names -> IDs)
         targets = _get_targets_for_camera(cam_key)  # e.g., ["person","dog"]
 
+        # Only the ROI (if any) goes to the model and the change gate
+        src, offset, polygon = crop_to_roi(raw, camera.get("roi"))
+
+        # Static scene -> repeat the previous result, skip YOLO
+        thumb = None
+        if gate_enabled(camera):
+            prev, thumb = gate.reuse(cam_key, src)
+            if prev is not None:
+                dets, _, prev_targets, _ = prev
+                return _finish(cam_id, day_dir, raw, raw_path, dets, 0.0, prev_targets, enc,
+                               reused=True)
+
         model = _get_model()
-        # YOLO name dict: id -> name
-        names = model.model.names if hasattr(model, "model") and hasattr(
-            model.model, "names") else model.names
-
-        # 1) If "All" (or "*") is present -> no class filter (detect everything)
-        detect_all = any(str(t).lower() in ("all", "*") for t in targets)
-        if detect_all:
-            classes_param = None  # YOLO will detect every class it knows
-        else:
-            # 2) Map target names -> class IDs (case-insensitive)
-            name_to_id = {str(v).lower(): k for k, v in names.items()}
-            wanted_ids = {
-                int(name_to_id[str(t).lower()])
-                for t in targets
-                if str(t).lower() in name_to_id
-            }
-            # None => all (fallback)
-            classes_param = sorted(wanted_ids) if wanted_ids else None
+        names = _model_names(model)
+        classes_param = _classes_for_targets(targets, names)
+
+        kwargs: Dict[str, Any] = {}
+        if camera.get("imgsz"):
+            kwargs["imgsz"] = int(camera["imgsz"])
 
         # Inference & tracking
         t1 = time.time()
         results = model.track(
-            source=raw,
+            source=src,
             tracker="bytetrack.yaml",
             persist=True,
             classes=classes_param,  # ← filter to targets (or None for all)
             conf=0.20,
             verbose=False,
+            **kwargs,
         )
         inf_ms = (time.time() - t1) * 1000.0
+        metrics.INFERENCE_SECONDS.observe(inf_ms / 1000.0, camera=cam_id)
 
         res = results[0]
         dets = _extract_dets(
@@ -303,36 +383,188 @@ def detect_one(camera: Dict) -> Tuple[int, Optional[str], Optional[str], Dict]:
             names,
             set(classes_param) if classes_param is not None else None,
         )
+        dets = map_to_frame(dets, offset, polygon)
+        if thumb is not None:
+            gate.remember(cam_key, thumb, (dets, inf_ms, targets, False))
 
-        # Annotated only if there are detections
-        annotated_path = None
-        if dets:
-            ann = _draw_anno(raw, dets)
-            annotated_path = _save_jpg(day_dir, cam_id, "annotated", ann)
-
-        meta = _to_meta(
+        return _finish(
             cam_id,
-            w,
-            h,
+            day_dir,
+            raw,
+            raw_path,
             dets,
             inf_ms if inf_ms > 0 else (time.time() - t0) * 1000.0,
             targets,
+            enc,
         )
 
-        return len(dets), raw_path, annotated_path, meta
-
     except Exception as e:
         # VERY IMPORTANT: never let a YOLO/model error break the main loop
         print(f"[DETECT] model error for camera={cam_id}: {e}")
 
-        meta = _to_meta(
+        meta = _with_encode(_to_meta(
             cam_id,
             w,
             h,
             [],
             0.0,
             [],
-        )
+        ), enc)
         # Optional: mark detection error
         # meta["compute"] = {"detection_error": str(e)}
         return 0, raw_path, None, meta
+
+
+def _infer_batch(
+    model,
+    frames: List[np.ndarray],
+    classes_param: Optional[List[int]],
+    imgsz: Optional[int],
+) -> Tuple[list, float]:
+    """One batched forward pass; returns (results, per-frame inference ms)."""
+    kwargs: Dict[str, Any] = {}
+    if imgsz:
+        kwargs["imgsz"] = int(imgsz)
+
+    t1 = time.time()
+    results = model.predict(
+        source=frames,
+        classes=classes_param,
+        conf=0.20,
+        verbose=False,
+        **kwargs,
+    )
+    inf_ms = (time.time() - t1) * 1000.0 / max(len(frames), 1)
+    return results, inf_ms
+
+
+def grab_frame(camera: Dict) -> Optional[np.ndarray]:
+    """Capture stage: latest usable frame for this camera (None if unusable)."""
+    raw = _grab_raw_frame(camera)
+    if raw is None or getattr(raw, "size", 0) == 0:
+        return None
+    return raw
+
+
+def infer_frames(
+    cameras: List[Dict],
+    frames: List[np.ndarray],
+) -> List[Optional[Inferred]]:
+    """
+    Inference stage: batched YOLO over (camera, frame) pairs.
+
+    Frames are cropped to each camera's ROI first. Cameras whose scene
+    hasn't changed (motion.gate) reuse their previous result without
+    running the model. The rest are grouped by (class filter, imgsz) and
+    each group is pushed through model.predict in chunks of
+    DETECT_BATCH_SIZE; boxes are mapped back to full-frame pixels. Returns one
+    Inferred tuple per input, or None where detection is disabled or the
+    model failed.
+    """
+    out: List[Optional[Inferred]] = [
+        None] * len(cameras)
+    if not DETECTION_ENABLED or not cameras:
+        return out
+
+    try:
+        model = _get_model()
+        names = _model_names(model)
+
+        # --- group cameras that can share one forward pass ---
+        groups: Dict[Tuple[Optional[Tuple[int, ...]], Optional[int]], list] = {}
+        thumbs: Dict[int, Any] = {}
+        crops = [crop_to_roi(f, c.get("roi")) for c, f in zip(cameras, frames)]
+        for i, camera in enumerate(cameras):
+            cam_key = camera.get("key") or camera.get("id") or "unknown"
+
+            # Static scene -> repeat the previous result, skip YOLO
+            if gate_enabled(camera):
+                prev, thumbs[i] = gate.reuse(cam_key, crops[i][0])
+                if prev is not None:
+                    dets, _, prev_targets, _ = prev
+                    out[i] = (dets, 0.0, prev_targets, True)
+                    continue
+
+            targets = _get_targets_for_camera(cam_key)
+            classes_param = _classes_for_targets(targets, names)
+            key = (tuple(classes_param) if classes_param is not None else None,
+                   camera.get("imgsz"))
+            groups.setdefault(key, []).append((i, targets))
+
+        for (classes_key, imgsz), members in groups.items():
+            classes_param = list(
+                classes_key) if classes_key is not None else None
+            allowed = set(classes_param) if classes_param is not None else None
+
+            for start in range(0, len(members), DETECT_BATCH_SIZE):
+                chunk = members[start:start + DETECT_BATCH_SIZE]
+                try:
+                    results, inf_ms = _infer_batch(
+                        model, [crops[i][0] for i, _ in chunk], classes_param, imgsz)
+                except Exception as e:
+                    print(f"[DETECT] batch model error: {e}")
+                    continue  # these cameras keep None (empty result)
+
+                for (i, targets), res in zip(chunk, results):
+                    _, offset, polygon = crops[i]
+                    dets = map_to_frame(
+                        _extract_dets(res, names, allowed), offset, polygon)
+                    out[i] = (dets, inf_ms, targets, False)
+                    metrics.INFERENCE_SECONDS.observe(
+                        inf_ms / 1000.0, camera=cameras[i].get("id") or "unknown")
+                    if i in thumbs:
+                        cam_key = cameras[i].get("key") or cameras[i].get("id") or "unknown"
+                        gate.remember(cam_key, thumbs[i], out[i])
+
+    except Exception as e:
+        # never let a YOLO/model error break the main loop
+        print(f"[DETECT] model error in batch: {e}")
+
+    return out
+
+
+def save_result(
+    camera: Dict,
+    raw: Optional[np.ndarray],
+    inferred: Optional[Inferred],
+) -> Tuple[int, Optional[str], Optional[str], Dict]:
+    """Encode stage: save RAW (+ ANNOTATED) frames and build the meta dict."""
+    cam_key = camera.get("key") or camera.get("id") or "unknown"
+    cam_id = camera.get("id") or cam_key
+
+    if raw is None:
+        # Could not grab a usable frame; return empty meta
+        return 0, None, None, _to_meta(cam_id, FRAME_WIDTH, FRAME_HEIGHT, [], 0.0, [])
+
+    day_dir = _day_dir()
+    enc = encode_settings(camera)
+    raw_path = _save_frame(day_dir, cam_id, "raw", raw, enc)
+    if inferred is None:
+        h, w = raw.shape[:2]
+        return 0, raw_path, None, _with_encode(_to_meta(cam_id, w, h, [], 0.0, []), enc)
+
+    dets, inf_ms, targets, reused = inferred
+    return _finish(cam_id, day_dir, raw, raw_path, dets, inf_ms, targets, enc, reused)
+
+
+def detect_many(cameras: List[Dict]) -> List[Tuple[int, Optional[str], Optional[str], Dict]]:
+    """
+    Batched variant of detect_one for every camera due in this tick.
+
+    Frames are grabbed for all cameras first, run through infer_frames in as
+    few forward passes as possible, then saved. Results come back in the same
+    order as `cameras`, with the same (count, raw_path, annotated_path, meta)
+    shape as detect_one.
+
+    Note: batched inference uses predict, not track, so track_id is None.
+    """
+    frames = [grab_frame(c) for c in cameras]
+    idx = [i for i, f in enumerate(frames) if f is not None]
+
+    inferred: List[Optional[Inferred]] = [
+        None] * len(cameras)
+    for i, res in zip(idx, infer_frames([cameras[i] for i in idx],
+                                        [frames[i] for i in idx])):
+        inferred[i] = res
+
+    return [save_result(c, f, r) for c, f, r in zip(cameras, frames, inferred)]
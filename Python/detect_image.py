@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 """
-Single-image YOLO detector (beginner-friendly)
+Image YOLO detector (beginner-friendly)
 
 - Loads YOLO11 (default yolo11n.pt)
-- Reads ONE image from disk
+- Reads ONE image from disk, a whole directory / glob (batch mode), or
+  the frames of a video file / stream (video mode)
 - Detects objects
 - Filters to classes you care about (e.g., person, cat)
 - Optionally POSTs JSON to your API
-- Optionally saves an annotated image
+- Optionally saves an annotated image (single-image mode)
+
+Batch mode loads the model once, decodes images on a worker pool, runs
+model.predict on --batch-size images at a time and streams one JSON line
+per image (same payload as single-image mode) to --out.
 
 Examples:
   # detect only people
@@ -16,12 +21,30 @@ Examples:
   # detect person + cat, send to API, and save an annotated image
   python detect_image.py --image test.jpg --classes person,cat \
       --api_url http://localhost:8000/detections --annotate out.jpg
+
+  # backfill a directory into a JSONL file
+  python detect_image.py --input-dir frames/2025-11-20 --classes person,car \
+      --batch-size 16 --workers 4 --out detections.jsonl
+
+  # or any glob (recursive ** allowed); JSONL goes to stdout by default
+  python detect_image.py --glob "frames/**/*_raw.jpg" > detections.jsonl
+
+  # recorded footage (file or rtsp:// / http:// URL), at most 2 frames/s
+  python detect_image.py --video lot.mp4 --max-fps 2 --classes person,car \
+      --out lot.jsonl --summary lot_summary.json
 """
 import argparse
+import glob
 import os
 import json
+import sys
+import threading
+import queue
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 
 import cv2
 import numpy as np
@@ -51,15 +74,15 @@ def parse_allowed_classes(s: str) -> List[str]:
     return uniq
 
 
-def post_json(api_url: Optional[str], payload: Dict[str, Any]) -> Optional[int]:
+def post_json(api_url: Optional[str], payload: Dict[str, Any], log=None) -> Optional[int]:
     if not api_url:
         return None
     try:
         r = requests.post(api_url, json=payload, timeout=30)
-        print(f"[API] status={r.status_code} response_len={len(r.text)}")
+        print(f"[API] status={r.status_code} response_len={len(r.text)}", file=log)
         return r.status_code
     except Exception as e:
-        print(f"[API] error: {e}")
+        print(f"[API] error: {e}", file=log)
         return -1
 
 
@@ -84,12 +107,278 @@ def draw_boxes(image, dets, color=(0, 255, 0)):
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
 
 
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def extract_dets(result, names, allowed: List[str], w: int, h: int) -> List[Dict[str, Any]]:
+    dets = []
+    if result.boxes is not None and len(result.boxes) > 0:
+        xyxy = result.boxes.xyxy.cpu().numpy()
+        confs = result.boxes.conf.cpu().numpy()
+        clss = result.boxes.cls.cpu().numpy().astype(int)
+
+        for bb, c, ci in zip(xyxy, confs, clss):
+            cname = names[int(ci)] if names and int(
+                ci) in names else str(int(ci))
+            if cname not in allowed:
+                continue
+            x1, y1, x2, y2 = map(float, bb)
+            # also provide relative box (0..1)
+            rel = [x1 / w, y1 / h, (x2 - x1) / w, (y2 - y1) / h]
+            dets.append({
+                "class_id": int(ci),
+                "class_name": cname,
+                "confidence": float(c),
+                "bbox_xyxy": [x1, y1, x2, y2],
+                "bbox_xywh": [x1, y1, x2 - x1, y2 - y1],
+                "bbox_rel": rel,
+            })
+    return dets
+
+
+def build_payload(image_name: str, w: int, h: int, allowed: List[str],
+                  dets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "timestamp_utc": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+        "image_name": image_name,
+        "image_size": {"width": w, "height": h},
+        "classes_requested": allowed,
+        "detections": dets,
+    }
+
+
+def model_names(model):
+    return model.model.names if hasattr(model, "model") else model.names
+
+
+# ---------------- batch mode ----------------
+
+def iter_image_paths(input_dir: Optional[str], pattern: Optional[str]) -> Iterator[str]:
+    """Image paths from a directory (non-recursive, sorted) or a glob."""
+    if pattern:
+        for p in sorted(glob.iglob(pattern, recursive=True)):
+            if os.path.isfile(p):
+                yield p
+        return
+    with os.scandir(input_dir) as it:
+        names = sorted(e.name for e in it
+                       if e.is_file() and e.name.lower().endswith(IMAGE_EXTS))
+    for name in names:
+        yield os.path.join(input_dir, name)
+
+
+def _decode(path: str) -> Tuple[str, Optional[np.ndarray]]:
+    return path, cv2.imread(path)  # imread releases the GIL -> threads scale
+
+
+def decoded_batches(paths: Iterator[str], batch_size: int,
+                    workers: int) -> Iterator[List[Tuple[str, Optional[np.ndarray]]]]:
+    """Decode on a thread pool, keeping only a few batches in flight (bounded memory)."""
+    max_in_flight = batch_size * 2 + workers
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as pool:
+        pending: deque = deque()
+        batch: List[Tuple[str, Optional[np.ndarray]]] = []
+        paths = iter(paths)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                p = next(paths, None)
+                if p is None:
+                    exhausted = True
+                    break
+                pending.append(pool.submit(_decode, p))
+            if not pending:
+                break
+            batch.append(pending.popleft().result())  # keeps input order
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def run_batch(args, allowed: List[str]) -> None:
+    out = sys.stdout if args.out in (None, "-") else open(args.out, "w", encoding="utf-8")
+    log = sys.stderr if out is sys.stdout else sys.stdout  # keep stdout pure JSONL
+
+    print(f"[INFO] Loading model: {args.model}", file=log)
+    model = YOLO(args.model)
+    names = model_names(model)
+
+    n_images = n_failed = 0
+    t0 = time.perf_counter()
+    try:
+        for batch in decoded_batches(iter_image_paths(args.input_dir, args.glob),
+                                     args.batch_size, args.workers):
+            good = [(p, img) for p, img in batch if img is not None]
+            for p, img in batch:
+                if img is None:
+                    n_failed += 1
+                    print(f"[WARN] Failed to read image: {p}", file=log)
+            if not good:
+                continue
+
+            results = model.predict([img for _, img in good], conf=args.conf, verbose=False)
+            for (path, img), r in zip(good, results):
+                h, w = img.shape[:2]
+                payload = build_payload(os.path.basename(path), w, h, allowed,
+                                        extract_dets(r, names, allowed, w, h))
+                out.write(json.dumps(payload) + "\n")
+                post_json(args.api_url, payload, log)
+            out.flush()
+            n_images += len(good)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - t0
+    rate = n_images / elapsed if elapsed > 0 else 0.0
+    print(f"[INFO] {n_images} images ({n_failed} unreadable) in {elapsed:.1f}s "
+          f"-> {rate:.1f} images/s", file=log)
+
+
+# ---------------- video mode ----------------
+
+def _video_frames(src: str, stride: int, max_fps: Optional[float], q: "queue.Queue",
+                  stats: Dict[str, float]) -> None:
+    """Reader thread: grab every frame, decode only the kept ones, put (idx, t, img)."""
+    cap = cv2.VideoCapture(src)
+    try:
+        if not cap.isOpened():
+            stats["error"] = f"Cannot open video: {src}"
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        stats["source_fps"] = fps
+        min_gap = 1.0 / max_fps if max_fps else 0.0
+        next_keep = 0.0
+        idx = -1
+        while True:
+            t0 = time.perf_counter()
+            if not cap.grab():  # demux + no decode: cheap way to skip
+                break
+            idx += 1
+            t_video = idx / fps if fps > 0 else time.monotonic()
+            keep = idx % stride == 0 and t_video + 1e-6 >= next_keep
+            img = None
+            t1 = time.perf_counter()
+            stats["grab_sec"] += t1 - t0
+            if keep:
+                ok, img = cap.retrieve()
+                keep = ok and img is not None
+                stats["retrieve_sec"] += time.perf_counter() - t1
+            stats["frames_read"] += 1
+            if keep:
+                next_keep = t_video + min_gap
+                stats["frames_decoded"] += 1
+                q.put((idx, t_video if fps > 0 else None, img))
+    finally:
+        cap.release()
+        q.put(None)
+
+
+def run_video(args, allowed: List[str]) -> None:
+    out = sys.stdout if args.out in (None, "-") else open(args.out, "w", encoding="utf-8")
+    log = sys.stderr if out is sys.stdout else sys.stdout
+
+    print(f"[INFO] Loading model: {args.model}", file=log)
+    model = YOLO(args.model)
+    names = model_names(model)
+
+    # grab_sec: demux of every frame; retrieve_sec: decode of the kept ones
+    stats: Dict[str, Any] = {"grab_sec": 0.0, "retrieve_sec": 0.0,
+                             "frames_read": 0, "frames_decoded": 0}
+    q: "queue.Queue" = queue.Queue(maxsize=args.batch_size * 2)
+    reader = threading.Thread(target=_video_frames, daemon=True, name="video-reader",
+                              args=(args.video, max(1, args.stride), args.max_fps, q, stats))
+
+    # per class: total boxes, frames containing it, max boxes in one frame
+    totals: Dict[str, Dict[str, int]] = {
+        c: {"detections": 0, "frames": 0, "max_per_frame": 0} for c in allowed}
+    infer_sec = 0.0
+    n_frames = 0
+    base = os.path.basename(args.video.rstrip("/")) or args.video
+
+    def flush(batch):
+        nonlocal infer_sec, n_frames
+        t0 = time.perf_counter()
+        results = model.predict([img for _, _, img in batch], conf=args.conf, verbose=False)
+        infer_sec += time.perf_counter() - t0
+        for (idx, t_video, img), r in zip(batch, results):
+            h, w = img.shape[:2]
+            dets = extract_dets(r, names, allowed, w, h)
+            payload = build_payload(f"{base}#{idx}", w, h, allowed, dets)
+            payload["frame_index"] = idx
+            payload["video_time_sec"] = round(t_video, 3) if t_video is not None else None
+            out.write(json.dumps(payload) + "\n")
+
+            per_class: Dict[str, int] = {}
+            for d in dets:
+                per_class[d["class_name"]] = per_class.get(d["class_name"], 0) + 1
+            for c, n in per_class.items():
+                agg = totals[c]
+                agg["detections"] += n
+                agg["frames"] += 1
+                agg["max_per_frame"] = max(agg["max_per_frame"], n)
+        out.flush()
+        n_frames += len(batch)
+
+    t_start = time.perf_counter()
+    reader.start()
+    try:
+        batch = []
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= args.batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if "error" in stats:
+        raise SystemExit(stats["error"])
+
+    wall = time.perf_counter() - t_start
+    summary = {
+        "video": args.video,
+        "source_fps": round(stats.get("source_fps", 0.0), 2),
+        "frames_read": stats["frames_read"],
+        "frames_processed": n_frames,
+        "stride": args.stride,
+        "max_fps": args.max_fps,
+        "classes": totals,
+        "decode_fps": round(stats["frames_decoded"] / stats["retrieve_sec"], 1)
+        if stats["retrieve_sec"] > 0 else None,
+        "read_fps": round(stats["frames_read"] / stats["grab_sec"], 1)
+        if stats["grab_sec"] > 0 else None,
+        "inference_fps": round(n_frames / infer_sec, 1) if infer_sec > 0 else None,
+        "end_to_end_fps": round(n_frames / wall, 1) if wall > 0 else None,
+        "wall_sec": round(wall, 2),
+    }
+    print("[INFO] summary: " + json.dumps(summary), file=log)
+    print(f"[INFO] {n_frames}/{stats['frames_read']} frames processed in {wall:.1f}s | "
+          f"decode {summary['decode_fps']} fps | inference {summary['inference_fps']} fps",
+          file=log)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
 def main():
     ap = argparse.ArgumentParser(
-        description="Single-image YOLO detection with class filter + optional API POST")
+        description="Image YOLO detection with class filter + optional API POST")
     ap.add_argument("--model", default="yolo11n.pt",
                     help="Ultralytics weights (yolo11n.pt, yolo11s.pt, etc.)")
-    ap.add_argument("--image", required=True, help="Path to the input image")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--image", help="Path to the input image")
+    src.add_argument("--input-dir", help="Batch mode: every image in this directory")
+    src.add_argument("--glob", help="Batch mode: images matching this glob (** allowed)")
+    src.add_argument("--video", help="Video mode: local video file or stream URL")
     ap.add_argument("--classes", default="person",
                     help="Comma-separated classes to keep (e.g., 'person,cat')")
     ap.add_argument("--conf", type=float, default=0.25,
@@ -98,12 +387,31 @@ def main():
                     help="Optional endpoint to POST detection JSON")
     ap.add_argument("--annotate", default=None,
                     help="Optional path to save annotated image")
+    ap.add_argument("--batch-size", type=int, default=16,
+                    help="Batch / video mode: images per model.predict call")
+    ap.add_argument("--workers", type=int, default=4,
+                    help="Batch mode: image decoding threads")
+    ap.add_argument("--out", default="-",
+                    help="Batch / video mode: JSONL output file ('-' = stdout)")
+    ap.add_argument("--stride", type=int, default=1,
+                    help="Video mode: process every Nth frame (others are skipped undecoded)")
+    ap.add_argument("--max-fps", type=float, default=None,
+                    help="Video mode: process at most this many frames per video second")
+    ap.add_argument("--summary", default=None,
+                    help="Video mode: also write the aggregate summary JSON here")
     args = ap.parse_args()
 
+    allowed = parse_allowed_classes(args.classes)
+    if args.video:
+        run_video(args, allowed)
+        return
+    if args.image is None:
+        run_batch(args, allowed)
+        return
+
     if not os.path.exists(args.image):
         raise SystemExit(f"Image not found: {args.image}")
 
-    allowed = parse_allowed_classes(args.classes)
     print(f"[INFO] Allowed classes: {allowed}")
 
     img = cv2.imread(args.image)
@@ -116,40 +424,10 @@ def main():
 
     # run once on this image
     results = model.predict(img, conf=args.conf, verbose=False)
-    names = model.model.names if hasattr(model, "model") else model.names
+    names = model_names(model)
 
-    dets = []
-    if results:
-        r = results[0]
-        if r.boxes is not None and len(r.boxes) > 0:
-            xyxy = r.boxes.xyxy.cpu().numpy()
-            confs = r.boxes.conf.cpu().numpy()
-            clss = r.boxes.cls.cpu().numpy().astype(int)
-
-            for bb, c, ci in zip(xyxy, confs, clss):
-                cname = names[int(ci)] if names and int(
-                    ci) in names else str(int(ci))
-                if cname not in allowed:
-                    continue
-                x1, y1, x2, y2 = map(float, bb)
-                # also provide relative box (0..1)
-                rel = [x1 / w, y1 / h, (x2 - x1) / w, (y2 - y1) / h]
-                dets.append({
-                    "class_id": int(ci),
-                    "class_name": cname,
-                    "confidence": float(c),
-                    "bbox_xyxy": [x1, y1, x2, y2],
-                    "bbox_xywh": [x1, y1, x2 - x1, y2 - y1],
-                    "bbox_rel": rel,
-                })
-
-    payload = {
-        "timestamp_utc": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
-        "image_name": os.path.basename(args.image),
-        "image_size": {"width": w, "height": h},
-        "classes_requested": allowed,
-        "detections": dets,
-    }
+    dets = extract_dets(results[0], names, allowed, w, h) if results else []
+    payload = build_payload(os.path.basename(args.image), w, h, allowed, dets)
 
     # print JSON to console
     print(json.dumps(payload, indent=2))
@@ -0,0 +1,174 @@
+"""
+Size index of frames/ (per day directory and camera) and its reconciliation.
+
+db.disk_usage is kept current by the code that writes and deletes frames
+(store_local, the file reaper, spool eviction, sync's RAW delete), so
+quota checks and the heartbeat read a few rows instead of walking the
+tree. ReconcileThread corrects it in the background, one day directory
+per RECONCILE_EVERY_SEC at nice 19:
+
+- files no row references (a crash between saving a frame and
+  store_local, render caches of deleted rows) are orphans; those older
+  than RECONCILE_GRACE_SEC are deleted (RECONCILE_DELETE_ORPHANS; only
+  counted while DELETE_OLD_FRAMES is False). Files older than
+  RETENTION_DAYS are never orphans: cleanup drops their rows and may
+  keep the files on purpose
+- the day's index rows are replaced with what is actually on disk
+- empty past day directories are removed, index rows of missing ones dropped
+
+Today is only reconciled by the one-time full build (first run after an
+upgrade, recorded with a marker row); frames are still being written there.
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from colorama import Fore, Style
+
+from config import (
+    FRAME_ROOT,
+    RETENTION_DAYS,
+    DELETE_OLD_FRAMES,
+    RECONCILE_EVERY_SEC,
+    RECONCILE_GRACE_SEC,
+    RECONCILE_DELETE_ORPHANS,
+)
+from db import (frame_key, disk_usage_days, replace_disk_usage, get_frame_names_between,
+                disk_usage_built, mark_disk_usage_built)
+
+_DAY_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def du_info(m): print(Fore.CYAN + m + Style.RESET_ALL)
+def du_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+def _day_dirs() -> List[str]:
+    try:
+        return sorted(d for d in os.listdir(FRAME_ROOT)
+                      if _DAY_RE.fullmatch(d) and os.path.isdir(os.path.join(FRAME_ROOT, d)))
+    except OSError:
+        return []
+
+
+def _referenced(day: str) -> set:
+    """Frame names referenced by rows; rows are stored a moment after the
+    file is written, so the window reaches into the neighbouring days."""
+    start = datetime.strptime(day, "%Y-%m-%d")
+    names = get_frame_names_between((start - timedelta(days=1)).isoformat() + "Z",
+                                    (start + timedelta(days=2)).isoformat() + "Z")
+    # a referenced RAW keeps its rendered twin (render.annotated_path_for)
+    for n in list(names):
+        root, ext = os.path.splitext(n)
+        if root.endswith("_raw"):
+            names.add(root[:-len("_raw")] + "_annotated" + ext)
+    return names
+
+
+def reconcile_day(day: str, delete_orphans: bool = RECONCILE_DELETE_ORPHANS
+                  ) -> Tuple[Dict[str, Tuple[int, int]], int, int]:
+    """Measure one day directory and replace its index rows.
+
+    Returns ({camera: (files, bytes)}, orphans found, orphan bytes deleted).
+    """
+    path = os.path.join(FRAME_ROOT, day)
+    referenced = _referenced(day)
+    delete_orphans = delete_orphans and DELETE_OLD_FRAMES
+    now = time.time()
+    cutoff = now - RECONCILE_GRACE_SEC
+    # older files may belong to rows retention cleanup removed on purpose
+    retained = now - RETENTION_DAYS * 86400
+    per_camera: Dict[str, List[int]] = {}
+    orphans = 0
+    freed = 0
+
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        entries = []
+    for e in entries:
+        try:
+            if not e.is_file(follow_symlinks=False):
+                continue
+            st = e.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if e.name not in referenced and retained < st.st_mtime < cutoff:
+            orphans += 1
+            if delete_orphans:
+                try:
+                    os.remove(e.path)
+                    freed += st.st_size
+                    continue
+                except OSError as ex:
+                    du_warn(f"[DISK] could not delete orphan {e.path}: {ex}")
+        acc = per_camera.setdefault(frame_key(e.path)[1], [0, 0])
+        acc[0] += 1
+        acc[1] += st.st_size
+
+    measured = {cam: (files, size) for cam, (files, size) in per_camera.items()}
+    replace_disk_usage(day, measured)
+    return measured, orphans, freed
+
+
+class ReconcileThread(threading.Thread):
+    """Low-priority background pass over frames/, one day per step."""
+
+    def __init__(self, stop_event: threading.Event):
+        super().__init__(daemon=True, name="disk-reconcile")
+        self.stop_event = stop_event
+        self._cursor: Optional[str] = None  # last day reconciled
+
+    def _next_day(self, days: List[str], today: str) -> Optional[str]:
+        past = [d for d in days if d < today]
+        if not past:
+            return None
+        later = [d for d in past if self._cursor is None or d > self._cursor]
+        return later[0] if later else past[0]  # wrap around
+
+    def step(self) -> None:
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        days = _day_dirs()
+
+        # index rows of directories that no longer exist
+        for day in set(disk_usage_days()) - set(days):
+            replace_disk_usage(day, {})
+
+        if not disk_usage_built():
+            # first run: build the whole index once (today included)
+            for day in days:
+                reconcile_day(day)
+            mark_disk_usage_built()
+            du_info(f"[DISK] size index built for {len(days)} day(s)")
+            return
+
+        day = self._next_day(days, today)
+        if day is None:
+            return
+        self._cursor = day
+        measured, orphans, freed = reconcile_day(day)
+        if orphans:
+            du_warn(f"[DISK] {day}: {orphans} orphaned frame file(s)"
+                    + (f", {freed} bytes deleted" if freed else ""))
+        if not measured:
+            try:
+                os.rmdir(os.path.join(FRAME_ROOT, day))
+            except OSError:
+                pass
+
+    def run(self):
+        try:
+            # Linux: per-thread nice value, so the walk yields to detection
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except Exception:
+            pass
+        while not self.stop_event.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                du_warn(f"[DISK] reconcile error: {e}")
+            self.stop_event.wait(RECONCILE_EVERY_SEC)
@@ -0,0 +1,127 @@
+"""
+Frame encoding: format, quality and resolution per camera.
+
+- JPEG (default) or WebP.
+- Optional downscale for the stored copy (store_max_width) and a separate,
+  usually smaller, width for what sync uploads (upload_max_width).
+- JPEG goes through the fastest encoder that is installed:
+  simplejpeg / PyTurboJPEG (libjpeg-turbo) when available, else cv2.imencode.
+
+Camera records may carry imageFormat / jpegQuality / storeMaxWidth /
+uploadMaxWidth; anything missing falls back to the ENCODE_* config values.
+"""
+
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import (
+    ENCODE_FORMAT,
+    ENCODE_QUALITY,
+    ENCODE_STORE_MAX_WIDTH,
+    ENCODE_UPLOAD_MAX_WIDTH,
+)
+
+# optional fast JPEG backends (libjpeg-turbo bindings)
+try:
+    import simplejpeg  # type: ignore
+except Exception:
+    simplejpeg = None
+
+try:
+    from turbojpeg import TurboJPEG  # type: ignore
+    _turbo = TurboJPEG()
+except Exception:
+    _turbo = None
+
+MIME_TYPES = {"jpg": "image/jpeg", "webp": "image/webp"}
+
+
+def jpeg_backend() -> str:
+    if simplejpeg is not None:
+        return "simplejpeg"
+    if _turbo is not None:
+        return "turbojpeg"
+    return "opencv"
+
+
+def encode_settings(camera: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Effective settings for this camera (camera record overrides config)."""
+    camera = camera or {}
+
+    def pick(key, default):
+        value = camera.get(key)
+        return default if value is None else value
+
+    fmt = str(pick("image_format", ENCODE_FORMAT)).lower()
+    if fmt in ("jpeg", "jpg"):
+        fmt = "jpg"
+    elif fmt != "webp":
+        fmt = "jpg"
+    return {
+        "format": fmt,
+        "quality": int(pick("jpeg_quality", ENCODE_QUALITY)),
+        "store_max_width": pick("store_max_width", ENCODE_STORE_MAX_WIDTH),
+        "upload_max_width": pick("upload_max_width", ENCODE_UPLOAD_MAX_WIDTH),
+    }
+
+
+def _fit_width(img: np.ndarray, max_width: Optional[int]) -> np.ndarray:
+    h, w = img.shape[:2]
+    if not max_width or w <= int(max_width):
+        return img
+    new_w = int(max_width)
+    new_h = max(1, round(h * new_w / w))
+    return cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
+
+
+def encode_image(
+    img: np.ndarray,
+    fmt: str = "jpg",
+    quality: int = ENCODE_QUALITY,
+    max_width: Optional[int] = None,
+) -> Tuple[bytes, Dict[str, Any]]:
+    """Encode a BGR frame. Returns (bytes, stats) with bytes/ms/size/backend."""
+    t0 = time.perf_counter()
+    img = _fit_width(img, max_width)
+
+    if fmt == "webp":
+        backend = "opencv"
+        ok, buf = cv2.imencode(
+            ".webp", img, [int(cv2.IMWRITE_WEBP_QUALITY), int(quality)])
+        if not ok:
+            raise RuntimeError("webp encode failed")
+        data = buf.tobytes()
+    else:
+        backend = jpeg_backend()
+        if backend == "simplejpeg":
+            data = simplejpeg.encode_jpeg(
+                np.ascontiguousarray(img), quality=int(quality), colorspace="BGR")
+        elif backend == "turbojpeg":
+            data = _turbo.encode(img, quality=int(quality))
+        else:
+            ok, buf = cv2.imencode(
+                ".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+            if not ok:
+                raise RuntimeError("jpeg encode failed")
+            data = buf.tobytes()
+
+    h, w = img.shape[:2]
+    return data, {
+        "bytes": len(data),
+        "ms": round((time.perf_counter() - t0) * 1000.0, 2),
+        "width": int(w),
+        "height": int(h),
+        "backend": backend,
+    }
+
+
+def transcode_file(path: str, fmt: str, quality: int, max_width: Optional[int]) -> Optional[bytes]:
+    """Re-encode a stored frame for upload; None if it is already small enough."""
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None or not max_width or img.shape[1] <= int(max_width):
+        return None
+    data, _ = encode_image(img, fmt, quality, max_width)
+    return data
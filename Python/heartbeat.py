@@ -12,9 +12,14 @@ from config import (
     HEARTBEAT_URL,
     HEARTBEAT_APP_VERSION,
     REQUESTS_VERIFY_TLS,
+    DETECTIONS_INDEX_ENABLED,
+    HEARTBEAT_DETECTIONS_WINDOW_SEC,
 )
 from colorama import Fore, Style
 
+import query
+from db import disk_usage_by_camera
+
 
 def hb_ok(m): print(Fore.GREEN + m + Style.RESET_ALL)
 def hb_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
@@ -72,6 +77,24 @@ class HeartbeatThread(threading.Thread):
                     "appVersion": HEARTBEAT_APP_VERSION,
                     "status": "ok",
                 }
+                if DETECTIONS_INDEX_ENABLED:
+                    try:
+                        # {camera: {class: detections}} over the last window
+                        payload["detections"] = {
+                            "windowSec": HEARTBEAT_DETECTIONS_WINDOW_SEC,
+                            "byCamera": query.recent_summary(HEARTBEAT_DETECTIONS_WINDOW_SEC),
+                        }
+                    except Exception as ex:
+                        hb_warn(f"[HB] detections summary failed: {ex}")
+                try:
+                    # {camera: bytes under frames/} from the size index
+                    usage = disk_usage_by_camera()
+                    payload["diskUsage"] = {
+                        "totalBytes": sum(usage.values()),
+                        "byCamera": usage,
+                    }
+                except Exception as ex:
+                    hb_warn(f"[HB] disk usage failed: {ex}")
 
                 resp = self.session.post(
                     HEARTBEAT_URL,
@@ -3,20 +3,30 @@ import json
 import signal
 import time
 import threading
-import requests
 from typing import List, Dict, Any
-from datetime import datetime, timezone
 from colorama import init as colorama_init, Fore, Style
 from config import (
     CAMERAS_JSON_PATH, DETECT_EVERY_SEC, SYNC_EVERY_SEC,
-    CLEANUP_EVERY_SEC, RETENTION_DAYS,
+    CLEANUP_EVERY_SEC, RETENTION_DAYS, CLEANUP_CHUNK_ROWS, CLEANUP_CHUNK_PAUSE_SEC,
     REMOTE_CAMERAS_URL, REMOTE_CAMERAS_TTL_SEC, REMOTE_CAMERAS_REQUIRED,
-    REQUESTS_VERIFY_TLS
+    CAPTURE_PERSISTENT, DETECT_BATCHED, DETECT_BATCH_SIZE, PIPELINE_MODE,
+    METRICS_PORT, METRICS_BIND, SPOOL_CHECK_EVERY_SEC
 )
-from db import init_db, store_local, cleanup_old_synced, get_last_capture_utc
-from detect import detect_one
+from db import (init_db, store_local, cleanup_old_synced, get_last_capture_utc, flush_db,
+                count_unsynced)
+from detect import detect_one, detect_many, watch_targets
+from metacodec import encode_meta
 from sync import sync_unsent_once
+import spool
 from heartbeat import HeartbeatThread
+from diskusage import ReconcileThread
+from pipeline import DetectionPipeline, MaintenanceThread
+import capture
+import metrics
+from profiling import profiler
+from roi import parse_roi
+from refresher import RemoteSnapshot, refresher, REFRESH_TIMEOUT_SEC
+from scheduler import Scheduler
 
 colorama_init(autoreset=True)
 def ok(m): print(Fore.GREEN + m + Style.RESET_ALL)
@@ -27,28 +37,28 @@ def err(m): print(Fore.RED + m + Style.RESET_ALL)
 
 stop_flag = False
 stop_event = threading.Event()
+# wakes the main loop early (stop, new camera list, profiling request)
+_wake = threading.Event()
 
 
 def _handle(sig, frame):
     global stop_flag
     stop_flag = True
     stop_event.set()
+    _wake.set()
     warn("\n[SYS] Stop signal received. Shutting down...")
 
 
 signal.signal(signal.SIGINT, _handle)
 signal.signal(signal.SIGTERM, _handle)
+profiler.install_signal(_wake.set)  # SIGUSR1 -> profiling window
 
 # ---------------- remote cameras cache ----------------
 _cameras: List[Dict[str, Any]] = []
-_cam_expires_at: float = 0.0
-
-try:
-    from zoneinfo import ZoneInfo  # Python 3.9+
-    TORONTO_TZ = ZoneInfo("America/Toronto")
-except Exception:
-    TORONTO_TZ = None  # Fallback if zoneinfo isn't available
+_cam_version: int = -1  # _cam_snapshot.version currently in _cameras
 
+# per-camera next-due heap; batched inference keeps whole batches in phase
+_scheduler = Scheduler(DETECT_BATCH_SIZE if DETECT_BATCHED else 1)
 
 def get_last_capture_utc_safe():
     # You can implement this to query your local DB, or maintain a global variable
@@ -66,37 +76,50 @@ def _uniq_ids(cams: List[Dict[str, Any]]) -> None:
         raise ValueError("Duplicate camera 'id' from remote/local cameras.")
 
 
+def _int_or_none(v: Any) -> int | None:
+    try:
+        return int(v) if v not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
 def _normalize_cam(c: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "key": str(c.get("key", "")).strip(),
         "id": str(c.get("id", "")).strip(),
         "location": c.get("location"),
-        "rtsp": c.get("rtsp")
+        "rtsp": c.get("rtsp"),
+        # optional per-camera change gate override (None -> MOTION_GATE_ENABLED)
+        "motion_gate": c.get("motionGate", c.get("motion_gate")),
+        # optional per-camera encoding (None -> ENCODE_* defaults)
+        "image_format": c.get("imageFormat"),
+        "jpeg_quality": c.get("jpegQuality"),
+        "store_max_width": c.get("storeMaxWidth"),
+        "upload_max_width": c.get("uploadMaxWidth"),
+        # optional region of interest (rect or polygon) + inference size
+        "roi": parse_roi(c.get("roi")),
+        "imgsz": _int_or_none(c.get("imgsz")),
+        # optional cadence (see scheduler.py); None -> SCHEDULE_* defaults
+        "schedule": c.get("schedule") if isinstance(c.get("schedule"), dict) else None,
+        "interval_sec": _int_or_none(c.get("intervalSec")),
     }
 
 
-def _fetch_remote_cameras() -> List[Dict[str, Any]]:
-    if not REMOTE_CAMERAS_URL:
-        return []
-    try:
-        r = requests.get(REMOTE_CAMERAS_URL, timeout=30,
-                         verify=REQUESTS_VERIFY_TLS)
-        if r.status_code != 200:
-            warn(f"[REMOTE] GET /cameras -> {r.status_code}")
-            return []
-        data = r.json()
-        if not isinstance(data["result"], list):
-            warn("[REMOTE] invalid payload (expected array)")
-            return []
-        activeCameras = [x for x in data["result"] if x.get("isActive")]
-        cams = [_normalize_cam(c)
-                for c in activeCameras if isinstance(c, dict)]
-        cams = [c for c in cams if c["id"]]  # require id
-        _uniq_ids(cams)
-        return cams
-    except Exception as e:
-        warn(f"[REMOTE] cameras fetch error: {e}")
-        return []
+def _parse_remote_cameras(data: Any) -> List[Dict[str, Any]]:
+    """GET /cameras payload -> active cameras; raises on an invalid payload."""
+    if not isinstance(data["result"], list):
+        raise ValueError("invalid payload (expected array)")
+    activeCameras = [x for x in data["result"] if x.get("isActive")]
+    cams = [_normalize_cam(c)
+            for c in activeCameras if isinstance(c, dict)]
+    cams = [c for c in cams if c["id"]]  # require id
+    _uniq_ids(cams)
+    return cams
+
+
+# refreshed in the background (refresher.py); a failed fetch keeps the last list
+_cam_snapshot = RemoteSnapshot("cameras", REMOTE_CAMERAS_URL, REMOTE_CAMERAS_TTL_SEC,
+                               _parse_remote_cameras, default=[], on_change=_wake.set)
 
 
 def _load_local_cameras() -> List[Dict[str, Any]]:
@@ -115,12 +138,24 @@ def _load_local_cameras() -> List[Dict[str, Any]]:
 
 
 def _refresh_cameras(force: bool = False) -> None:
-    global _cameras, _cam_expires_at
-    now = time.time()
-    if not force and now < _cam_expires_at:
-        return
+    """Adopt the latest camera snapshot, if it changed.
 
-    cams = _fetch_remote_cameras()
+    Never touches the network, except that force=True (first load) waits
+    for the refresher's first answer, for the cameras and the per-camera
+    detection targets alike.
+    """
+    global _cameras, _cam_version
+    if force:
+        refresher.add(_cam_snapshot)
+        targets = watch_targets()
+        _cam_snapshot.wait_loaded(REFRESH_TIMEOUT_SEC + 5)
+        if targets.url:  # no URL: built-in defaults, nothing to wait for
+            targets.wait_loaded(REFRESH_TIMEOUT_SEC + 5)
+
+    if _cam_snapshot.version == _cam_version:
+        return
+    _cam_version = _cam_snapshot.version
+    cams = _cam_snapshot.value
     src = "REMOTE"
     # if not cams:
     #     cams = _load_local_cameras()
@@ -130,43 +165,18 @@ def _refresh_cameras(force: bool = False) -> None:
         if REMOTE_CAMERAS_REQUIRED:
             raise RuntimeError("No cameras available (remote required).")
         warn("[CAMERAS] none available; using empty list")
-        _cameras = []
-        _cam_expires_at = now + REMOTE_CAMERAS_TTL_SEC
-        return
+        cams = []
+    else:
+        info(f"[CAMERAS] {len(cams)} loaded from {src}")
 
     _cameras = cams
-    _cam_expires_at = now + REMOTE_CAMERAS_TTL_SEC
-    info(f"[CAMERAS] {len(_cameras)} loaded from {src}")
+    _scheduler.sync(_cameras, time.time())
 
-# ------------------------------------------------------
-
-
-def _toronto_now_from_ts(ts: float) -> datetime:
-    """
-    Convert a POSIX timestamp to Toronto local time (America/Toronto).
-    Falls back to system local time if zoneinfo isn't available.
-    """
-    if TORONTO_TZ is not None:
-        return datetime.fromtimestamp(ts, TORONTO_TZ)
-    # Fallback: assume system local time is already Toronto time
-    return datetime.fromtimestamp(ts)
-
-
-def _detect_interval_seconds(now_ts: float) -> int:
-    """
-    Return capture interval (in seconds) based on Toronto local time:
-    - 06:00 <= time < 18:00 -> every 5 minutes
-    - otherwise             -> every 1 hour
-    """
-    dt = _toronto_now_from_ts(now_ts)
-    hour = dt.hour
+    # keep one persistent reader per camera in step with the list
+    if CAPTURE_PERSISTENT:
+        capture.manager.sync(_cameras)
 
-    if 6 <= hour < 18:
-        # Daytime: every 5 minutes
-        return 5 * 60
-    else:
-        # Nighttime: every 1 hour
-        return 60 * 60
+# ------------------------------------------------------
 
 
 def main():
@@ -177,55 +187,97 @@ def main():
     hb_thread = HeartbeatThread(stop_event, get_last_capture_utc_safe)
     hb_thread.start()
 
+    # keep the frames/ size index honest and collect orphaned frames
+    ReconcileThread(stop_event).start()
+
     # First load (required before loop)
     _refresh_cameras(force=True)
 
+    # Optional /metrics endpoint; these gauges are computed per scrape
+    metrics.UNSYNCED_ROWS.set_function(count_unsynced)
+    metrics.CAMERA_REFRESH_AGE.set_function(
+        lambda: time.time() - _cam_snapshot.checked_at if _cam_snapshot.checked_at else -1.0)
+    metrics.start_server(METRICS_PORT, METRICS_BIND)
+
+    pipeline = None
+    if PIPELINE_MODE:
+        pipeline = DetectionPipeline(stop_event)
+        pipeline.start()
+        MaintenanceThread(stop_event).start()
+
     info("[SYS] Running. Press Ctrl+C to stop.")
-    last_detect = 0.0
-    last_sync = 0.0
-    last_cleanup = 0.0
-    last_cam_refresh = 0.0
+    next_sync = 0.0
+    next_cleanup = 0.0
+    next_spool = 0.0
 
     while not stop_flag:
+        _wake.clear()
         now = time.time()
-
-        # refresh camera list by TTL
-        if now - last_cam_refresh >= 1.0:  # check TTL every second
-            _refresh_cameras()
-            last_cam_refresh = now
-
-        # detect cadence
-        detect_interval = _detect_interval_seconds(now)
-        if now - last_detect >= detect_interval:
-            if not _cameras:
-                warn("[DETECT] skipped: no cameras configured")
+        profiler.poll()
+
+        # adopt a refreshed camera list (fetched in the background)
+        _refresh_cameras()
+
+        # cameras whose slot has come (staggered, per-camera cadence)
+        due = _scheduler.pop_due(now)
+        if due:
+            metrics.LOOP_LAG_SECONDS.set(now - min(d for _, d in due))
+            cams = [c for c, _ in due]
+            if pipeline is not None:
+                pipeline.submit(cams)
             else:
-                for cam in _cameras:
+                if DETECT_BATCHED:
+                    results = detect_many(cams)
+                else:
+                    results = [detect_one(cam) for cam in cams]
+
+                for cam, (count, raw_path, ann_path, meta) in zip(cams, results):
                     cam_id = cam["key"]
-                    count, raw_path, ann_path, meta = detect_one(cam)
-                    meta_json = json.dumps(meta, ensure_ascii=False)
-                    store_local(cam_id, count, meta_json, raw_path, ann_path)
+                    if raw_path is None:
+                        # no usable frame this tick (reader reconnecting): no row
+                        warn(f"[DETECT] camera={cam_id} no frame; skipped")
+                        continue
+                    meta_json = encode_meta(meta)
+                    store_local(cam_id, count, meta_json, raw_path, ann_path, meta)
                     ok(
                         f"[DETECT] camera={cam_id} count={count} saved "
                         f"(raw={bool(raw_path)} ann={bool(ann_path)})"
                     )
-            last_detect = now
 
         # sync cadence (backoff is handled inside)
-        if now - last_sync >= SYNC_EVERY_SEC:
+        # (pipeline mode: MaintenanceThread does sync, cleanup and the spool)
+        if pipeline is None and now >= next_sync:
             sync_unsent_once()
-            last_sync = now
+            next_sync = now + SYNC_EVERY_SEC
 
         # cleanup cadence
-        if now - last_cleanup >= CLEANUP_EVERY_SEC:
-            deleted = cleanup_old_synced(RETENTION_DAYS)
+        if pipeline is None and now >= next_cleanup:
+            deleted = cleanup_old_synced(RETENTION_DAYS, CLEANUP_CHUNK_ROWS)
             if deleted > 0:
                 warn(
                     f"[CLEANUP] Deleted {deleted} old synced rows (> {RETENTION_DAYS} days)")
-            last_cleanup = now
+            # full chunk -> more expired rows waiting; continue shortly
+            next_cleanup = now + (CLEANUP_CHUNK_PAUSE_SEC
+                                  if deleted >= CLEANUP_CHUNK_ROWS else CLEANUP_EVERY_SEC)
 
-        time.sleep(0.2)
+        # disk budget: evict frames if frames/ + DB outgrew SPOOL_MAX_BYTES
+        if pipeline is None and now >= next_spool:
+            spool.enforce()
+            next_spool = now + SPOOL_CHECK_EVERY_SEC
 
+        # sleep until the next event instead of polling (_wake cuts it short)
+        now = time.time()
+        wake_at = [now + 60.0, now + (profiler.next_poll() - time.monotonic())]
+        if _scheduler.next_due() is not None:
+            wake_at.append(_scheduler.next_due())
+        if pipeline is None:
+            wake_at += [next_sync, next_cleanup, next_spool]
+        _wake.wait(max(0.0, min(wake_at) - now))
+
+    if pipeline is not None:
+        pipeline.join()
+    capture.manager.stop_all()
+    flush_db()
     info("[SYS] Exiting.")
 
 
@@ -0,0 +1,120 @@
+"""
+Compact encoding for row meta (meta_json column + upload "meta" field).
+
+META_FORMAT = "json" (default) stores plain JSON exactly as before.
+META_FORMAT = "packed" stores a versioned text blob:
+
+    "pk1:" + base64( zlib( <B version> <I header_len> <header JSON>
+                           <H class_id * n> <f conf * n> <f xyxy * 4n> <i track_id * n> ) )
+
+The header is the meta without "detections", plus n and the class-id ->
+name table. Boxes and confidences are float32, which is what the model
+produces, so decoding gives back the same values. Detections with keys
+beyond the standard five stay inside the header JSON as they are.
+
+decode_meta() accepts both forms, so readers never need to know which
+one a row was written with. META_UPLOAD_FORMAT picks what goes on the
+wire ("json" re-expands packed rows for servers that only speak JSON).
+"""
+
+import base64
+import json
+import struct
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from config import META_FORMAT, META_UPLOAD_FORMAT
+
+PACKED_TAG = "pk1:"
+PACKED_MIME = "application/vnd.edge-meta.pk1"
+_VERSION = 1
+_DET_KEYS = {"class_id", "class_name", "confidence", "bbox_xyxy", "track_id"}
+
+
+def is_packed(text: Optional[str]) -> bool:
+    return bool(text) and text.startswith(PACKED_TAG)
+
+
+def _pack(meta: Dict[str, Any]) -> str:
+    dets = meta.get("detections") or []
+    header = {k: v for k, v in meta.items() if k != "detections"}
+    columnar = all(set(d) <= _DET_KEYS for d in dets)
+
+    body = b""
+    if columnar:
+        n = len(dets)
+        header["_n"] = n
+        header["_names"] = {str(d["class_id"]): d["class_name"] for d in dets}
+        body = (
+            struct.pack(f"<{n}H", *(int(d["class_id"]) for d in dets))
+            + struct.pack(f"<{n}f", *(float(d["confidence"]) for d in dets))
+            + struct.pack(f"<{4 * n}f", *(float(v) for d in dets for v in d["bbox_xyxy"]))
+            + struct.pack(f"<{n}i", *(-1 if d.get("track_id") is None else int(d["track_id"])
+                                     for d in dets))
+        )
+    else:
+        header["detections"] = dets
+
+    head = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    raw = struct.pack("<BI", _VERSION, len(head)) + head + body
+    return PACKED_TAG + base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+
+
+def _unpack(text: str) -> Dict[str, Any]:
+    raw = zlib.decompress(base64.b64decode(text[len(PACKED_TAG):]))
+    version, head_len = struct.unpack_from("<BI", raw, 0)
+    if version != _VERSION:
+        raise ValueError(f"unsupported packed meta version {version}")
+    off = struct.calcsize("<BI")
+    meta = json.loads(raw[off:off + head_len].decode("utf-8"))
+    off += head_len
+
+    if "_n" not in meta:
+        return meta  # detections kept as JSON
+
+    n = meta.pop("_n")
+    names = meta.pop("_names")
+    class_ids = struct.unpack_from(f"<{n}H", raw, off)
+    off += 2 * n
+    confs = struct.unpack_from(f"<{n}f", raw, off)
+    off += 4 * n
+    boxes = struct.unpack_from(f"<{4 * n}f", raw, off)
+    off += 16 * n
+    tracks = struct.unpack_from(f"<{n}i", raw, off)
+
+    meta["detections"] = [
+        {
+            "class_id": class_ids[i],
+            "class_name": names.get(str(class_ids[i]), str(class_ids[i])),
+            "confidence": confs[i],
+            "bbox_xyxy": list(boxes[4 * i:4 * i + 4]),
+            "track_id": None if tracks[i] < 0 else tracks[i],
+        }
+        for i in range(n)
+    ]
+    return meta
+
+
+def encode_meta(meta: Dict[str, Any], fmt: str = META_FORMAT) -> str:
+    """meta dict -> text for the meta_json column."""
+    if fmt == "packed":
+        return _pack(meta)
+    return json.dumps(meta, ensure_ascii=False)
+
+
+def decode_meta(text: Optional[str]) -> Dict[str, Any]:
+    """meta_json column (JSON or packed) -> meta dict."""
+    if not text:
+        return {}
+    if is_packed(text):
+        return _unpack(text)
+    return json.loads(text)
+
+
+def for_upload(text: str, fmt: str = META_UPLOAD_FORMAT) -> Tuple[str, str]:
+    """Stored meta -> (wire text, content type) for META_UPLOAD_FORMAT."""
+    if fmt == "packed":
+        return (text, PACKED_MIME) if is_packed(text) else (_pack(json.loads(text)), PACKED_MIME)
+    if is_packed(text):
+        return json.dumps(_unpack(text), ensure_ascii=False), "application/json"
+    return text, "application/json"
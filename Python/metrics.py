@@ -0,0 +1,203 @@
+"""
+Tiny Prometheus-style metrics for the edge agent (no extra dependencies).
+
+- Counter / Gauge / Histogram with labels; updates are a dict lookup,
+  a bisect and a couple of additions under a lock -- cheap enough for the
+  per-frame hot path.
+- Gauges can also be computed at scrape time (set_function), e.g. the
+  unsynced backlog, so nothing polls the DB in the background.
+- start_server(port) exposes GET /metrics in the text exposition format
+  on a daemon thread (METRICS_PORT = None keeps it off; recording still
+  works and costs next to nothing).
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from colorama import Fore, Style
+
+
+def m_info(m): print(Fore.CYAN + m + Style.RESET_ALL)
+def m_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+# latency buckets (seconds): 1 ms .. 30 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _key(labels: Dict[str, str]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: _LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join(
+        f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in items)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str):
+        super().__init__(name, doc)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str):
+        super().__init__(name, doc)
+        self._values: Dict[_LabelKey, float] = {}
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = float(value)
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """Compute the (unlabelled) value when /metrics is scraped."""
+        self._fn = fn
+
+    def _samples(self) -> List[str]:
+        if self._fn is not None:
+            try:
+                return [f"{self.name} {float(self._fn())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[_LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        k = _key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(k)
+            if row is None:
+                row = self._values[k] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        out = []
+        for k, row in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                out.append(f"{self.name}_bucket{_fmt_labels(k, ('le', repr(bound)))} {cumulative}")
+            cumulative += row[len(self.buckets)]
+            out.append(f"{self.name}_bucket{_fmt_labels(k, ('le', '+Inf'))} {cumulative}")
+            out.append(f"{self.name}_sum{_fmt_labels(k)} {row[-1]}")
+            out.append(f"{self.name}_count{_fmt_labels(k)} {cumulative}")
+        return out
+
+
+def render_all() -> str:
+    return "\n".join(m.render() for m in _REGISTRY) + "\n"
+
+
+# ---------------- agent metrics ----------------
+
+CAPTURE_SECONDS = Histogram("edge_capture_seconds", "Frame grab latency per camera")
+INFERENCE_SECONDS = Histogram("edge_inference_seconds", "Model inference latency per camera (batch share)")
+ENCODE_SECONDS = Histogram("edge_encode_seconds", "Frame encode + write latency per camera")
+DB_WRITE_SECONDS = Histogram("edge_db_write_seconds", "Queue-to-commit latency of detection rows per camera")
+DB_COMMIT_SECONDS = Histogram("edge_db_commit_seconds", "Writer thread group-commit duration")
+FRAMES_TOTAL = Counter("edge_frames_total", "Frames processed per camera")
+UPLOAD_BYTES = Counter("edge_upload_bytes_total", "Bytes uploaded by sync (rate() = bytes/s)")
+UPLOAD_ROWS = Counter("edge_upload_rows_total", "Rows uploaded by sync, by outcome (skipped = not attempted after a halt)")
+UNSYNCED_ROWS = Gauge("edge_unsynced_rows", "Rows waiting to be uploaded")
+BACKOFF_SECONDS = Gauge("edge_sync_backoff_seconds", "Seconds left in the sync endpoint backoff (0 = none)")
+CAMERA_REFRESH_AGE = Gauge("edge_camera_refresh_age_seconds", "Seconds since the camera list was last loaded")
+LOOP_LAG_SECONDS = Gauge("edge_loop_lag_seconds", "How late the last detection tick started vs. its schedule")
+SPOOL_BYTES = Gauge("edge_spool_bytes", "Bytes held by frames/ and the DB at the last spool check")
+SPOOL_EVICTED_BYTES = Counter("edge_spool_evicted_bytes_total", "Frame bytes evicted by the spool budget, by tier")
+SPOOL_EVICTED_FILES = Counter("edge_spool_evicted_files_total", "Frame files evicted by the spool budget, by tier")
+
+
+# ---------------- HTTP endpoint ----------------
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_all().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep scrapes out of the journal
+
+
+def start_server(port: Optional[int], bind: str = "0.0.0.0") -> Optional[HTTPServer]:
+    # one serving thread: scrapes are serial, and scrape-time gauges reuse
+    # that thread's DB reader connection
+    if not port:
+        return None
+    try:
+        server = HTTPServer((bind, int(port)), _Handler)
+    except OSError as e:
+        m_warn(f"[METRICS] cannot listen on {bind}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever,
+                     name="metrics", daemon=True).start()
+    m_info(f"[METRICS] serving http://{bind}:{port}/metrics")
+    return server
@@ -0,0 +1,81 @@
+"""
+Per-camera change gate: skip inference when the scene hasn't changed.
+
+- Each processed frame is reduced to a small grayscale thumbnail.
+- The next frame's thumbnail is compared against it (mean absolute diff,
+  0..1). Below MOTION_DIFF_THRESHOLD the previous detection result is
+  reused instead of running YOLO again.
+- A full inference is still forced every MOTION_MAX_REUSE_SEC, so slow
+  changes (lighting, parked cars) are never missed for long.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import (
+    MOTION_GATE_ENABLED,
+    MOTION_DIFF_THRESHOLD,
+    MOTION_MAX_REUSE_SEC,
+)
+
+_THUMB_SIZE = (64, 36)  # (w, h): enough for scene change, ~2k pixels
+
+# (dets, inference_ms, targets, reused) as produced by detect.infer_frames
+Inferred = Tuple[List[Dict], float, List[str], bool]
+
+
+def gate_enabled(camera: Dict[str, Any]) -> bool:
+    """Per-camera override ("motion_gate" on the camera record) or the global default."""
+    flag = camera.get("motion_gate")
+    return MOTION_GATE_ENABLED if flag is None else bool(flag)
+
+
+def _thumb(frame: np.ndarray) -> np.ndarray:
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, _THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class ChangeGate:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # cam_key -> (thumbnail, last inferred result, time of last real inference)
+        self._last: Dict[str, Tuple[np.ndarray, Inferred, float]] = {}
+
+    def reuse(self, cam_key: str, frame: np.ndarray) -> Tuple[Optional[Inferred], np.ndarray]:
+        """Return (previous result or None, thumbnail of this frame).
+
+        A non-None result means the scene is static and inference can be skipped.
+        """
+        thumb = _thumb(frame)
+        with self._lock:
+            last = self._last.get(cam_key)
+        if last is None:
+            return None, thumb
+
+        prev_thumb, prev_result, inferred_at = last
+        if time.time() - inferred_at >= MOTION_MAX_REUSE_SEC:
+            return None, thumb
+        if prev_thumb.shape != thumb.shape:
+            return None, thumb
+
+        score = float(np.abs(thumb - prev_thumb).mean()) / 255.0
+        if score >= MOTION_DIFF_THRESHOLD:
+            return None, thumb
+        return prev_result, thumb
+
+    def remember(self, cam_key: str, thumb: np.ndarray, result: Inferred) -> None:
+        """Store the frame that was actually inferred as the new reference."""
+        with self._lock:
+            self._last[cam_key] = (thumb, result, time.time())
+
+    def forget(self, cam_key: str) -> None:
+        with self._lock:
+            self._last.pop(cam_key, None)
+
+
+# process-wide gate; detect.py consults it before inference
+gate = ChangeGate()
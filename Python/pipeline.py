@@ -0,0 +1,252 @@
+"""
+Staged detection pipeline: capture -> inference -> encode -> persist.
+
+Each stage runs on its own thread and hands work to the next one through a
+bounded queue, so JPEG encoding and SQLite writes overlap with inference.
+
+Backpressure:
+- capture -> inference and inference -> encode are coalescing queues keyed by
+  camera: a newer frame for the same camera replaces the stale one, and when
+  the queue is full the oldest item is dropped. Frames older than
+  PIPELINE_MAX_FRAME_AGE_SEC are dropped before inference.
+- encode -> persist blocks (those frames are already on disk).
+
+Sync, retention cleanup and the spool budget run on MaintenanceThread, so a
+slow upload never delays the next capture.
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from colorama import Fore, Style
+
+from config import (
+    DETECT_BATCH_SIZE,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_MAX_FRAME_AGE_SEC,
+    SYNC_EVERY_SEC,
+    CLEANUP_EVERY_SEC,
+    CLEANUP_CHUNK_ROWS,
+    CLEANUP_CHUNK_PAUSE_SEC,
+    RETENTION_DAYS,
+    SPOOL_CHECK_EVERY_SEC,
+)
+from db import store_local, cleanup_old_synced
+from detect import grab_frame, infer_frames, save_result
+from metacodec import encode_meta
+from sync import sync_unsent_once
+import spool
+
+
+def pl_ok(m): print(Fore.GREEN + m + Style.RESET_ALL)
+def pl_info(m): print(Fore.CYAN + m + Style.RESET_ALL)
+def pl_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+def _cam_key(camera: Dict[str, Any]) -> str:
+    return camera.get("key") or camera.get("id") or "unknown"
+
+
+class _CoalescingQueue:
+    """FIFO keyed by camera; put() never blocks, it drops instead.
+
+    maxsize=None: no cap beyond one entry per camera.
+    """
+
+    def __init__(self, maxsize: Optional[int]):
+        self.maxsize = None if maxsize is None else max(1, maxsize)
+        self.dropped = 0
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    def put(self, key: str, item: Any) -> None:
+        with self._cond:
+            if key in self._items:
+                del self._items[key]          # coalesce: newest frame wins
+                self.dropped += 1
+            elif self.maxsize is not None and len(self._items) >= self.maxsize:
+                self._items.popitem(last=False)  # drop the oldest
+                self.dropped += 1
+            self._items[key] = item
+            self._cond.notify()
+
+    def get_many(self, n: int, timeout: float) -> List[Any]:
+        """Wait up to `timeout` for at least one item, then take up to n."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            out = []
+            while self._items and len(out) < n:
+                out.append(self._items.popitem(last=False)[1])
+            return out
+
+
+class _Persist(NamedTuple):
+    """encode -> persist item; store_local's arguments."""
+    cam_id: str
+    count: int
+    meta_json: str
+    raw_path: Optional[str]
+    ann_path: Optional[str]
+    meta: Dict[str, Any]
+
+
+class DetectionPipeline:
+    def __init__(self, stop_event: threading.Event):
+        self.stop_event = stop_event
+        # capture requests, one per camera: the scheduler hands out disjoint
+        # camera groups, so a newer request only replaces the same camera's
+        self._ticks = _CoalescingQueue(None)
+        self._frames = _CoalescingQueue(PIPELINE_QUEUE_SIZE)
+        self._encode = _CoalescingQueue(PIPELINE_QUEUE_SIZE)
+        self._persist: "queue.Queue[_Persist]" = queue.Queue(PIPELINE_QUEUE_SIZE)
+        self._threads = [
+            threading.Thread(target=self._capture_loop,
+                             name="pl-capture", daemon=True),
+            threading.Thread(target=self._inference_loop,
+                             name="pl-inference", daemon=True),
+            threading.Thread(target=self._encode_loop,
+                             name="pl-encode", daemon=True),
+            threading.Thread(target=self._persist_loop,
+                             name="pl-persist", daemon=True),
+        ]
+
+    def start(self) -> None:
+        for t in self._threads:
+            t.start()
+        pl_info(f"[PIPELINE] started (queue size={PIPELINE_QUEUE_SIZE})")
+
+    def submit(self, cameras: List[Dict[str, Any]]) -> None:
+        """Schedule one capture of every camera in the list."""
+        for camera in cameras:
+            self._ticks.put(_cam_key(camera), camera)
+
+    def join(self, timeout: float = 5.0) -> None:
+        for t in self._threads:
+            t.join(timeout)
+
+    # ---------------- stages ----------------
+
+    def _capture_loop(self) -> None:
+        while not self.stop_event.is_set():
+            for camera in self._ticks.get_many(DETECT_BATCH_SIZE, timeout=0.5):
+                if self.stop_event.is_set():
+                    return
+                try:
+                    frame = grab_frame(camera)
+                except Exception as e:
+                    pl_warn(
+                        f"[PIPELINE] capture error camera={_cam_key(camera)}: {e}")
+                    frame = None
+                if frame is None:
+                    # no usable frame this tick: nothing to store for the camera
+                    continue
+                self._frames.put(_cam_key(camera),
+                                 (camera, frame, time.time()))
+
+    def _inference_loop(self) -> None:
+        while not self.stop_event.is_set():
+            items = self._frames.get_many(DETECT_BATCH_SIZE, timeout=0.5)
+            if not items:
+                continue
+
+            now = time.time()
+            fresh = []
+            for camera, frame, ts in items:
+                if now - ts > PIPELINE_MAX_FRAME_AGE_SEC:
+                    self._frames.dropped += 1
+                    pl_warn(
+                        f"[PIPELINE] dropped stale frame camera={_cam_key(camera)}")
+                    continue
+                fresh.append((camera, frame))
+
+            usable = [(c, f) for c, f in fresh if f is not None]
+            inferred = iter(infer_frames([c for c, _ in usable],
+                                         [f for _, f in usable]))
+            for camera, frame in fresh:
+                res = next(inferred) if frame is not None else None
+                self._encode.put(_cam_key(camera), (camera, frame, res))
+
+    def _encode_loop(self) -> None:
+        while not self.stop_event.is_set():
+            for camera, frame, res in self._encode.get_many(1, timeout=0.5):
+                try:
+                    count, raw_path, ann_path, meta = save_result(
+                        camera, frame, res)
+                    meta_json = encode_meta(meta)
+                except Exception as e:
+                    pl_warn(
+                        f"[PIPELINE] encode error camera={_cam_key(camera)}: {e}")
+                    continue
+
+                item = _Persist(camera["key"], count, meta_json, raw_path, ann_path, meta)
+                while not self.stop_event.is_set():
+                    try:
+                        self._persist.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+
+    def _persist_loop(self) -> None:
+        # drain what is left on shutdown so no saved frame loses its row
+        while not self.stop_event.is_set() or not self._persist.empty():
+            try:
+                item = self._persist.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                store_local(*item)
+                pl_ok(
+                    f"[DETECT] camera={item.cam_id} count={item.count} saved "
+                    f"(raw={bool(item.raw_path)} ann={bool(item.ann_path)})"
+                )
+            except Exception as e:
+                pl_warn(f"[PIPELINE] persist error camera={item.cam_id}: {e}")
+
+
+class MaintenanceThread(threading.Thread):
+    """Runs sync, retention cleanup and the spool budget off the detection path."""
+
+    def __init__(self, stop_event: threading.Event):
+        super().__init__(daemon=True, name="maintenance")
+        self.stop_event = stop_event
+
+    def run(self):
+        last_sync = 0.0
+        next_cleanup = 0.0
+        next_spool = 0.0
+        while not self.stop_event.is_set():
+            now = time.time()
+
+            if now - last_sync >= SYNC_EVERY_SEC:
+                try:
+                    sync_unsent_once()
+                except Exception as e:
+                    pl_warn(f"[SYNC] error: {e}")
+                last_sync = now
+
+            if now >= next_cleanup:
+                deleted = 0
+                try:
+                    deleted = cleanup_old_synced(
+                        RETENTION_DAYS, CLEANUP_CHUNK_ROWS)
+                    if deleted > 0:
+                        pl_warn(
+                            f"[CLEANUP] Deleted {deleted} old synced rows (> {RETENTION_DAYS} days)")
+                except Exception as e:
+                    pl_warn(f"[CLEANUP] error: {e}")
+                # full chunk -> more expired rows waiting; continue shortly
+                next_cleanup = now + (CLEANUP_CHUNK_PAUSE_SEC
+                                      if deleted >= CLEANUP_CHUNK_ROWS else CLEANUP_EVERY_SEC)
+
+            if now >= next_spool:
+                try:
+                    spool.enforce()
+                except Exception as e:
+                    pl_warn(f"[SPOOL] error: {e}")
+                next_spool = now + SPOOL_CHECK_EVERY_SEC
+
+            self.stop_event.wait(1.0)
@@ -0,0 +1,198 @@
+"""
+On-demand profiling windows for a running agent.
+
+Nothing is hooked in until a window is requested, either by
+- SIGUSR1:                     kill -USR1 <pid>
+- the trigger file:            echo 60 > diagnostics/profile.trigger
+  (the optional number is the window length in seconds; the file is
+  removed when it is picked up)
+
+A window then runs for PROFILE_SECONDS and writes into DIAG_DIR:
+- PROFILE_MODE = "cprofile":  profile_<ts>.prof (pstats) + profile_<ts>.txt,
+                              main-loop thread only
+- PROFILE_MODE = "sample":    profile_<ts>.folded, stacks of every thread
+                              sampled every PROFILE_SAMPLE_INTERVAL_MS
+                              (flamegraph.pl / speedscope "collapsed" format)
+- PROFILE_TRACEMALLOC:        tracemalloc_<ts>.txt, allocation growth
+                              between the start and the end of the window
+
+When idle the cost is a flag check per loop and one stat() of the
+trigger file per second.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Optional
+
+from colorama import Fore, Style
+
+from config import (
+    DIAG_DIR,
+    PROFILE_SECONDS,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_TRIGGER_FILE,
+    PROFILE_TRACEMALLOC,
+)
+
+
+def prof_info(m): print(Fore.CYAN + m + Style.RESET_ALL)
+def prof_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+def _stamp() -> str:
+    return datetime.now().strftime("%Y%m%dT%H%M%S")
+
+
+class _Sampler(threading.Thread):
+    """Wall-clock stack sampler over all threads (sys._current_frames)."""
+
+    def __init__(self, seconds: float, interval: float, path: str):
+        super().__init__(daemon=True, name="profile-sampler")
+        self.seconds = seconds
+        self.interval = interval
+        self.path = path
+
+    def run(self):
+        stacks: Counter = Counter()
+        names = {}
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            names.update((t.ident, t.name) for t in threading.enumerate())
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                parts.append(names.get(ident, str(ident)))
+                stacks[";".join(reversed(parts))] += 1
+            time.sleep(self.interval)
+
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, n in stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        prof_info(f"[PROFILE] {sum(stacks.values())} samples -> {self.path}")
+
+
+class Profiler:
+    """Starts/stops profiling windows; poll() must run on the main-loop thread."""
+
+    def __init__(self):
+        self._requested: Optional[float] = None   # set by the signal handler
+        self._next_file_check = 0.0
+        self._deadline = 0.0
+        self._stamp = ""
+        self._profile: Optional[cProfile.Profile] = None
+        self._mem_start: Optional[tracemalloc.Snapshot] = None
+
+    def request(self, seconds: Optional[float] = None) -> None:
+        """Ask for a window (safe to call from a signal handler)."""
+        self._requested = float(seconds or PROFILE_SECONDS)
+
+    def install_signal(self, on_request: Optional[Callable[[], None]] = None) -> None:
+        """SIGUSR1 -> request(); `on_request` lets a sleeping main loop wake up."""
+        def _handler(sig, frame):
+            self.request()
+            if on_request is not None:
+                on_request()
+
+        if hasattr(signal, "SIGUSR1"):  # not on Windows
+            signal.signal(signal.SIGUSR1, _handler)
+
+    @property
+    def active(self) -> bool:
+        return self._deadline > 0.0
+
+    def _check_trigger_file(self, now: float) -> None:
+        if now < self._next_file_check or not PROFILE_TRIGGER_FILE:
+            return
+        self._next_file_check = now + 1.0
+        if not os.path.exists(PROFILE_TRIGGER_FILE):
+            return
+        seconds = None
+        try:
+            with open(PROFILE_TRIGGER_FILE, "r", encoding="utf-8") as f:
+                seconds = float(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            pass
+        try:
+            os.remove(PROFILE_TRIGGER_FILE)
+        except OSError:
+            pass
+        self.request(seconds)
+
+    def next_poll(self) -> float:
+        """Monotonic time by which poll() should run again (inf if never)."""
+        if self.active:
+            return self._deadline
+        return self._next_file_check if PROFILE_TRIGGER_FILE else float("inf")
+
+    def poll(self) -> None:
+        now = time.monotonic()
+        if self.active:
+            if now >= self._deadline:
+                self._stop()
+            return
+
+        self._check_trigger_file(now)
+        if self._requested is not None:
+            seconds, self._requested = self._requested, None
+            self._start(seconds)
+
+    def _start(self, seconds: float) -> None:
+        os.makedirs(DIAG_DIR, exist_ok=True)
+        self._stamp = _stamp()
+        self._deadline = time.monotonic() + seconds
+
+        if PROFILE_TRACEMALLOC:
+            tracemalloc.start(25)
+            self._mem_start = tracemalloc.take_snapshot()
+
+        if PROFILE_MODE == "sample":
+            path = os.path.join(DIAG_DIR, f"profile_{self._stamp}.folded")
+            _Sampler(seconds, PROFILE_SAMPLE_INTERVAL_MS / 1000.0, path).start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        prof_info(f"[PROFILE] {PROFILE_MODE} window started for {seconds:g}s")
+
+    def _stop(self) -> None:
+        self._deadline = 0.0
+
+        if self._profile is not None:
+            self._profile.disable()
+            base = os.path.join(DIAG_DIR, f"profile_{self._stamp}")
+            self._profile.dump_stats(base + ".prof")
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(40)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(out.getvalue())
+            self._profile = None
+            prof_info(f"[PROFILE] cProfile -> {base}.prof")
+
+        if self._mem_start is not None:
+            end = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            path = os.path.join(DIAG_DIR, f"tracemalloc_{self._stamp}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# top allocation growth over the window (file:line)\n")
+                for stat in end.compare_to(self._mem_start, "lineno")[:50]:
+                    f.write(f"{stat}\n")
+            self._mem_start = None
+            prof_info(f"[PROFILE] tracemalloc -> {path}")
+
+
+profiler = Profiler()
@@ -0,0 +1,171 @@
+"""
+On-device queries over the normalized detections table (db.py).
+
+Time ranges are epoch seconds [start, end). Queries are range scans on
+idx_det_cam_ts (camera given), idx_det_class_ts (class given) or, for
+all cameras, idx_det_row bounded by the first snapshot of the range, so
+"people on CAM3 between 8 and 9am" never touches meta_json.
+
+    python query.py counts --camera CAM3 --since 2025-11-20T08:00 --until 2025-11-20T09:00
+    python query.py timeline person --since 6h --bucket 900
+"""
+
+import argparse
+import json
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from db import read_connection
+
+
+def _iso(ts: float) -> str:
+    """Epoch -> people_count.created_at form (ISO UTC, trailing Z)."""
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None) \
+        .isoformat(timespec="seconds") + "Z"
+
+
+def _row_floor(start: float) -> Optional[int]:
+    """First snapshot id at/after `start`; ids grow with time (idx_pc_created)."""
+    cur = read_connection().cursor()
+    cur.execute("SELECT MIN(id) FROM people_count WHERE created_at >= ?", (_iso(start),))
+    return cur.fetchone()[0]
+
+
+def _snapshots(start: float, end: float, camera_id: Optional[str]) -> int:
+    """Snapshot rows in range (idx_pc_created)."""
+    sql = "SELECT COUNT(*) FROM people_count WHERE created_at >= ? AND created_at < ?"
+    params: List[Any] = [_iso(start), _iso(end)]
+    if camera_id:
+        sql += " AND camera_id = ?"
+        params.append(camera_id)
+    cur = read_connection().cursor()
+    cur.execute(sql, params)
+    return int(cur.fetchone()[0])
+
+
+def class_counts(start: float, end: float,
+                 camera_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """{class: detections, avg/max per snapshot, mean confidence} over [start, end)."""
+    where = "ts >= ? AND ts < ?"
+    params: List[Any] = [start, end]
+    if camera_id:
+        where += " AND camera_id = ?"
+        params.append(camera_id)
+    else:
+        floor = _row_floor(start)
+        if floor is None:
+            return {}
+        where += " AND row_id >= ?"
+        params.append(floor)
+
+    cur = read_connection().cursor()
+    cur.execute(
+        "SELECT class_name, COUNT(*), COUNT(DISTINCT row_id), AVG(confidence) "
+        f"FROM detections WHERE {where} GROUP BY class_name ORDER BY COUNT(*) DESC",
+        params,
+    )
+    rows = cur.fetchall()
+
+    cur.execute(
+        "SELECT class_name, MAX(n) FROM ("
+        "  SELECT class_name, row_id, COUNT(*) AS n FROM detections "
+        f"  WHERE {where} GROUP BY class_name, row_id) GROUP BY class_name",
+        params,
+    )
+    peaks = dict(cur.fetchall())
+
+    snapshots = _snapshots(start, end, camera_id)
+    return {
+        cls: {
+            "detections": int(n),
+            "snapshots_with": int(rows_with),
+            "avg_per_snapshot": round(n / snapshots, 3) if snapshots else 0.0,
+            "max_per_snapshot": int(peaks.get(cls) or 0),
+            "conf_avg": round(conf or 0.0, 3),
+        }
+        for cls, n, rows_with, conf in rows
+    }
+
+
+def timeline(class_name: str, start: float, end: float, bucket_sec: int = 900,
+             camera_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Detections of one class per time bucket (only non-empty buckets)."""
+    bucket_sec = max(1, int(bucket_sec))
+    sql = (
+        "SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, COUNT(*), COUNT(DISTINCT row_id) "
+        "FROM detections WHERE class_name = ? AND ts >= ? AND ts < ?"
+    )
+    params: List[Any] = [bucket_sec, bucket_sec, class_name, start, end]
+    if camera_id:
+        sql += " AND camera_id = ?"
+        params.append(camera_id)
+    cur = read_connection().cursor()
+    cur.execute(sql + " GROUP BY bucket ORDER BY bucket", params)
+    return [
+        {"bucket_start": int(b), "detections": int(n), "snapshots_with": int(rows_with)}
+        for b, n, rows_with in cur.fetchall()
+    ]
+
+
+def recent_summary(window_sec: int = 3600) -> Dict[str, Dict[str, int]]:
+    """{camera: {class: detections}} over the last window (heartbeat figure)."""
+    cutoff = time.time() - window_sec
+    first = _row_floor(cutoff)
+    if first is None:
+        return {}
+    cur = read_connection().cursor()
+    cur.execute(
+        "SELECT camera_id, class_name, COUNT(*) FROM detections "
+        "WHERE row_id >= ? AND ts >= ? GROUP BY camera_id, class_name",
+        (first, cutoff),
+    )
+    out: Dict[str, Dict[str, int]] = {}
+    for cam, cls, n in cur.fetchall():
+        out.setdefault(cam, {})[cls] = int(n)
+    return out
+
+
+# ------------------ CLI ------------------
+
+def _parse_time(text: Optional[str], default: float) -> float:
+    """'6h' / '30m' / '2d' (ago), epoch seconds, or ISO (naive = local time)."""
+    if not text:
+        return default
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", text)
+    if m:
+        mult = {"s": 1, "m": 60, "h": 3600, "d": 86400}[m.group(2)]
+        return time.time() - float(m.group(1)) * mult
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Query the local detections table.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    c = sub.add_parser("counts", help="per-class aggregates over a time range")
+    t = sub.add_parser("timeline", help="one class bucketed over time")
+    t.add_argument("class_name")
+    t.add_argument("--bucket", type=int, default=900, help="bucket size in seconds")
+    for p in (c, t):
+        p.add_argument("--camera", default=None)
+        p.add_argument("--since", default="1h", help="'6h', epoch, or ISO time")
+        p.add_argument("--until", default=None, help="default: now")
+
+    args = ap.parse_args()
+    start = _parse_time(args.since, time.time() - 3600)
+    end = _parse_time(args.until, time.time())
+
+    if args.cmd == "counts":
+        out: Any = class_counts(start, end, args.camera)
+    else:
+        out = timeline(args.class_name, start, end, args.bucket, args.camera)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
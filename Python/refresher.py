@@ -0,0 +1,142 @@
+"""
+Background refresh of remote lists (cameras, detection targets).
+
+Each RemoteSnapshot is one GET endpoint whose parsed result is swapped in
+as a whole (readers just take snapshot.value; never a half-updated list).
+A single daemon thread re-fetches every snapshot when its TTL is up:
+- conditional GET (If-None-Match / If-Modified-Since), so an unchanged
+  list costs one 304; servers without validators are compared by body hash
+- on errors / bad payloads the last good snapshot keeps being served
+- the capture / detection loop never waits on the network
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from colorama import Fore, Style
+
+from config import REQUESTS_VERIFY_TLS
+
+REFRESH_TIMEOUT_SEC = 30
+
+
+def rf_info(m): print(Fore.CYAN + m + Style.RESET_ALL)
+def rf_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+class RemoteSnapshot:
+    """Latest good parse of one endpoint; `parse(json)` raises on invalid payloads."""
+
+    def __init__(self, name: str, url: Optional[str], ttl: float,
+                 parse: Callable[[Any], Any], default: Any = None,
+                 on_change: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.url = url
+        self.ttl = float(ttl)
+        self.parse = parse
+        self.on_change = on_change  # called (refresher thread) after a swap
+        self.value = default
+        self.version = 0            # bumped whenever value is replaced
+        self.checked_at = 0.0       # last successful 200 / 304
+        self.next_at = 0.0
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._body_hash: Optional[str] = None
+        self._loaded = threading.Event()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    def refresh(self, session: requests.Session) -> bool:
+        """One conditional GET; returns True if the endpoint answered sanely."""
+        self.next_at = time.time() + self.ttl
+        if not self.url:
+            self._loaded.set()
+            return False
+
+        headers: Dict[str, str] = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+
+        try:
+            r = session.get(self.url, headers=headers, timeout=REFRESH_TIMEOUT_SEC,
+                            verify=REQUESTS_VERIFY_TLS)
+            if r.status_code == 304:
+                self.checked_at = time.time()
+                return True
+            if r.status_code != 200:
+                rf_warn(f"[REMOTE] GET {self.name} -> {r.status_code}; keeping last snapshot")
+                return False
+
+            body_hash = hashlib.sha1(r.content).hexdigest()
+            if body_hash != self._body_hash or not self.loaded:
+                value = self.parse(r.json())
+                self.value = value  # single reference swap
+                self.version += 1
+                self._body_hash = body_hash
+                rf_info(f"[REMOTE] {self.name} updated (v{self.version})")
+                if self.on_change is not None:
+                    self.on_change()
+            self._etag = r.headers.get("ETag")
+            self._last_modified = r.headers.get("Last-Modified")
+            self.checked_at = time.time()
+            return True
+        except Exception as e:
+            rf_warn(f"[REMOTE] {self.name} refresh error: {e}; keeping last snapshot")
+            return False
+        finally:
+            self._loaded.set()
+
+    def wait_loaded(self, timeout: Optional[float] = None) -> bool:
+        return self._loaded.wait(timeout)
+
+
+class Refresher(threading.Thread):
+    """Daemon thread that keeps every registered snapshot fresh."""
+
+    def __init__(self):
+        super().__init__(daemon=True, name="remote-refresher")
+        self._snapshots: List[RemoteSnapshot] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._session = requests.Session()  # keep-alive across refreshes
+        self._running = False
+
+    def add(self, snapshot: RemoteSnapshot) -> RemoteSnapshot:
+        with self._lock:
+            if snapshot not in self._snapshots:
+                self._snapshots.append(snapshot)
+        self.ensure_started()
+        self._wake.set()
+        return snapshot
+
+    def ensure_started(self) -> None:
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self.start()
+
+    def run(self):
+        while True:
+            self._wake.clear()
+            with self._lock:
+                snapshots = list(self._snapshots)
+
+            now = time.time()
+            for s in snapshots:
+                if now >= s.next_at:
+                    s.refresh(self._session)
+
+            with self._lock:
+                due = min((s.next_at for s in self._snapshots), default=now + 60)
+            self._wake.wait(max(0.0, due - time.time()))
+
+
+refresher = Refresher()
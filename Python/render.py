@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+On-demand rendering of annotated frames from stored metadata.
+
+With ANNOTATION_MODE = "metadata" the agent stores and uploads only the RAW
+frame; the boxes live in meta["detections"]. This module draws them when
+someone actually wants to look at them, and caches the result next to the
+RAW file (<cam>_<ts>_annotated.<ext>) so the second request is free.
+
+Examples:
+  # render row 1234 from edge_data.db (prints the cached file path)
+  python render.py 1234
+
+  # render several rows, ignore any cached copy
+  python render.py 1234 1235 --no-cache
+"""
+import argparse
+import os
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from config import ENCODE_QUALITY
+from metacodec import decode_meta
+
+_COLOR = (0, 220, 255)
+
+
+def draw_annotations(img: np.ndarray, dets: List[Dict], scale: float = 1.0) -> np.ndarray:
+    """Copy of img with boxes + labels; `scale` maps full-frame boxes onto a resized frame."""
+    out = img.copy()
+    for d in dets:
+        x1, y1, x2, y2 = (int(v * scale) for v in d["bbox_xyxy"])
+        cv2.rectangle(out, (x1, y1), (x2, y2), _COLOR, 2)
+        label = f'{d["class_name"]} {d["confidence"]:.2f}'
+        if d.get("track_id") is not None:  # untracked (batched predict) boxes
+            label = f'id{d["track_id"]} {label}'
+        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
+        cv2.rectangle(out, (x1, y1 - th - 4), (x1 + tw, y1), _COLOR, -1)
+        cv2.putText(out, label, (x1, y1 - 2),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
+    return out
+
+
+def annotated_path_for(raw_path: str) -> str:
+    """Cache location for the rendered twin of a RAW frame."""
+    root, ext = os.path.splitext(raw_path)
+    if root.endswith("_raw"):
+        root = root[:-len("_raw")]
+    return f"{root}_annotated{ext}"
+
+
+def render_annotated(raw_path: str, meta: Dict, use_cache: bool = True) -> Optional[str]:
+    """Draw meta["detections"] onto the RAW frame; returns the annotated file path.
+
+    Returns None if the RAW file is gone (e.g. deleted after a successful sync).
+    """
+    out_path = annotated_path_for(raw_path)
+    if use_cache and os.path.isfile(out_path):
+        return out_path
+
+    img = cv2.imread(raw_path, cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+
+    # boxes are in full-frame pixels; the stored copy may have been downscaled
+    full_w = (meta.get("image") or {}).get("width") or img.shape[1]
+    scale = img.shape[1] / float(full_w)
+
+    ann = draw_annotations(img, meta.get("detections") or [], scale)
+    ext = os.path.splitext(out_path)[1].lower()
+    params = ([int(cv2.IMWRITE_WEBP_QUALITY), ENCODE_QUALITY] if ext == ".webp"
+              else [int(cv2.IMWRITE_JPEG_QUALITY), ENCODE_QUALITY])
+    if not cv2.imwrite(out_path, ann, params):
+        return None
+    return out_path
+
+
+def render_row(row_id: int, use_cache: bool = True) -> Optional[str]:
+    """Render the annotated frame for one people_count row."""
+    from db import get_row
+
+    row = get_row(row_id)
+    if row is None:
+        return None
+    _, _, _, _, meta_json, raw_path, ann_path = row
+    if ann_path and os.path.isfile(ann_path) and use_cache:
+        return ann_path  # stored by image-mode annotation
+    if not raw_path or not meta_json:
+        return None
+    return render_annotated(raw_path, decode_meta(meta_json), use_cache)
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Render annotated frames for stored rows (annotation-as-metadata mode)")
+    ap.add_argument("row_ids", nargs="+", type=int,
+                    help="people_count row id(s)")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="Re-render even if an annotated copy exists")
+    args = ap.parse_args()
+
+    for row_id in args.row_ids:
+        path = render_row(row_id, use_cache=not args.no_cache)
+        if path:
+            print(f"[RENDER] row={row_id} -> {path}")
+        else:
+            print(f"[RENDER] row={row_id}: nothing to render (row or RAW frame missing)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Per-camera region of interest (ROI).
+
+A camera record may carry "roi" as either
+- a rectangle  [x1, y1, x2, y2], or
+- a polygon    [[x, y], [x, y], ...]
+in pixels, or normalized 0..1 when every coordinate is <= 1.
+
+detect.py crops the frame to the ROI bounding box before inference, maps
+the boxes back to full-frame pixels, and (for polygons) keeps only
+detections whose bottom-centre point lies inside the polygon.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def parse_roi(value: Any) -> Optional[List[List[float]]]:
+    """Normalize a camera's ROI to a polygon point list (None if absent/invalid)."""
+    if not value:
+        return None
+    try:
+        if all(isinstance(v, (int, float)) for v in value):
+            if len(value) != 4:
+                return None
+            x1, y1, x2, y2 = (float(v) for v in value)
+            pts = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+        else:
+            pts = [[float(p[0]), float(p[1])] for p in value]
+    except Exception:
+        return None
+    return pts if len(pts) >= 3 else None
+
+
+def _is_rect(pts: np.ndarray) -> bool:
+    if len(pts) != 4:
+        return False
+    xs, ys = set(pts[:, 0].tolist()), set(pts[:, 1].tolist())
+    return len(xs) == 2 and len(ys) == 2
+
+
+def polygon_px(roi: List[List[float]], w: int, h: int) -> np.ndarray:
+    """ROI polygon in full-frame pixels (N x 2 float array)."""
+    pts = np.asarray(roi, dtype=np.float64)
+    if float(pts.max()) <= 1.0:
+        pts = pts * np.array([w, h], dtype=np.float64)
+    return pts
+
+
+def crop_to_roi(
+    frame: np.ndarray,
+    roi: Optional[List[List[float]]],
+) -> Tuple[np.ndarray, Tuple[int, int], Optional[np.ndarray]]:
+    """Return (crop, (offset_x, offset_y), polygon or None if a plain rectangle).
+
+    The crop is a view on `frame` (no copy). Without a usable ROI the full
+    frame comes back with a zero offset.
+    """
+    if not roi:
+        return frame, (0, 0), None
+
+    h, w = frame.shape[:2]
+    pts = polygon_px(roi, w, h)
+    x1 = int(max(0, np.floor(pts[:, 0].min())))
+    y1 = int(max(0, np.floor(pts[:, 1].min())))
+    x2 = int(min(w, np.ceil(pts[:, 0].max())))
+    y2 = int(min(h, np.ceil(pts[:, 1].max())))
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return frame, (0, 0), None
+
+    return frame[y1:y2, x1:x2], (x1, y1), None if _is_rect(pts) else pts
+
+
+def _points_in_polygon(points: np.ndarray, poly: np.ndarray) -> np.ndarray:
+    """Vectorized even-odd ray casting: (P x 2) points vs (N x 2) polygon -> bool[P]."""
+    px = points[:, 0][:, None]  # P x 1
+    py = points[:, 1][:, None]
+    x1, y1 = poly[:, 0][None, :], poly[:, 1][None, :]               # 1 x N
+    x2, y2 = np.roll(poly[:, 0], -1)[None, :], np.roll(poly[:, 1], -1)[None, :]
+
+    crosses = (y1 > py) != (y2 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+    hits = crosses & (px < x_at)
+    return (hits.sum(axis=1) % 2) == 1
+
+
+def map_to_frame(
+    dets: List[Dict],
+    offset: Tuple[int, int],
+    polygon: Optional[np.ndarray],
+) -> List[Dict]:
+    """Shift crop boxes back to full-frame pixels and drop boxes outside the polygon."""
+    if not dets:
+        return dets
+
+    ox, oy = offset
+    boxes = np.asarray([d["bbox_xyxy"] for d in dets], dtype=np.float64)
+    boxes += np.array([ox, oy, ox, oy], dtype=np.float64)
+
+    keep = np.ones(len(dets), dtype=bool)
+    if polygon is not None:
+        # bottom-centre ("feet") point decides whether a box is in the zone
+        anchors = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2.0, boxes[:, 3]], axis=1)
+        keep = _points_in_polygon(anchors, polygon)
+
+    out = []
+    for d, box, k in zip(dets, boxes, keep):
+        if k:
+            d["bbox_xyxy"] = [float(v) for v in box]
+            out.append(d)
+    return out
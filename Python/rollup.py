@@ -0,0 +1,115 @@
+"""
+Edge-side rollups (ROLLUP_ENABLED).
+
+Instead of uploading every snapshot row with its frames, each stored row
+is folded into per-camera, per-class aggregates over ROLLUP_WINDOW_SEC
+windows (db.store_local does this in the same write transaction), and
+sync.py uploads closed windows as compact JSON records to ROLLUP_URL.
+
+Only rows picked by ROLLUP_FRAME_POLICY keep going through the normal
+frame upload; the others are stored as db.ROLLUP_WAIT (local copy only)
+and count as synced once the server accepts their window's rollup.
+Retention cleanup removes them, and windows never accepted, either way:
+- "detections":       rows with at least one detection
+- "first_per_window": the first row of each camera window
+- "detections_or_first": either of the two
+- "all":              every row (rollups are uploaded in addition)
+- "none":             no frames at all, rollups only
+
+Accumulator rows (table rollups) per (camera, window, class):
+  samples, count_sum, count_min, count_max, conf_sum, conf_n
+plus a "_all" pseudo-class holding the total count of every sample.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import ROLLUP_WINDOW_SEC, ROLLUP_FRAME_POLICY
+from metacodec import decode_meta
+
+ALL = "_all"
+
+
+def window_start(ts: float, window_sec: int = ROLLUP_WINDOW_SEC) -> int:
+    return int(ts // window_sec) * int(window_sec)
+
+
+def class_stats(meta: Dict[str, Any]) -> Dict[str, Tuple[int, float, int]]:
+    """meta (detect._to_meta) -> {class: (count, confidence sum, confidences)}.
+
+    Every requested target gets an entry, so zero counts pull the minimum
+    and the average down; "_all" is the total over all classes.
+    """
+    stats: Dict[str, List[float]] = {
+        t: [0, 0.0, 0] for t in (meta.get("targets") or []) if t != "all"}
+    total = [0, 0.0, 0]
+    for d in meta.get("detections") or []:
+        s = stats.setdefault(d.get("class_name") or "unknown", [0, 0.0, 0])
+        conf = float(d.get("confidence") or 0.0)
+        for acc in (s, total):
+            acc[0] += 1
+            acc[1] += conf
+            acc[2] += 1
+    stats[ALL] = total
+    return {k: (int(v[0]), float(v[1]), int(v[2])) for k, v in stats.items()}
+
+
+def select_frame(count: int, first_in_window: bool,
+                 policy: str = ROLLUP_FRAME_POLICY) -> bool:
+    """Should this row's frames still be uploaded?"""
+    if policy == "all":
+        return True
+    if policy == "none":
+        return False
+    if policy == "first_per_window":
+        return first_in_window
+    if policy == "detections_or_first":
+        return count > 0 or first_in_window
+    return count > 0  # "detections"
+
+
+def meta_of(meta_json: Optional[str], meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if meta is not None:
+        return meta
+    try:
+        return decode_meta(meta_json)
+    except Exception:
+        return {}
+
+
+def build_records(rows: Iterable[tuple], window_sec: int = ROLLUP_WINDOW_SEC) -> List[Dict[str, Any]]:
+    """Accumulator rows -> one compact record per (camera, window).
+
+    rows: (camera_id, window_start, class_name, samples, count_sum,
+           count_min, count_max, conf_sum, conf_n)
+    """
+    windows: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    for cam, start, cls, samples, c_sum, c_min, c_max, conf_sum, conf_n in rows:
+        rec = windows.setdefault((cam, start), {
+            "camera_id": cam,
+            "window_start": int(start),
+            "window_sec": int(window_sec),
+            "samples": 0,
+            "classes": {},
+        })
+        entry = {
+            "n": int(samples),
+            "min": int(c_min),
+            "max": int(c_max),
+            "avg": round(c_sum / samples, 3) if samples else 0.0,
+            "conf_avg": round(conf_sum / conf_n, 3) if conf_n else 0.0,
+        }
+        if cls == ALL:
+            rec["samples"] = int(samples)
+            rec["total"] = entry
+        else:
+            rec["classes"][cls] = entry
+
+    # a class first seen mid-window was absent (0) in the earlier samples
+    for rec in windows.values():
+        rec.get("total", {}).pop("n", None)
+        for entry in rec["classes"].values():
+            if entry["n"] < rec["samples"]:
+                entry["avg"] = round(entry["avg"] * entry["n"] / rec["samples"], 3)
+                entry["min"] = 0
+            entry.pop("n")
+    return list(windows.values())
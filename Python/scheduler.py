@@ -0,0 +1,150 @@
+"""
+Per-camera detection schedule.
+
+- Every camera has a cadence profile: time zone, day window and the
+  interval to use inside / outside it. Defaults come from config
+  (SCHEDULE_*); a camera record may override any part via "schedule"
+  (or just "intervalSec" for a fixed cadence), e.g.
+      {"schedule": {"timezone": "America/Vancouver", "dayStart": 7,
+                    "dayEnd": 19, "dayIntervalSec": 120,
+                    "nightIntervalSec": 1800}}
+- Cameras get evenly spread phases inside their interval, so N cameras
+  on a 5-minute cadence fire one every 5/N minutes instead of all at once.
+  With batched inference, cameras share a phase in groups of
+  `group_size` (DETECT_BATCH_SIZE) so every tick is still one full batch.
+  Slots are aligned to the wall clock, so a restart keeps the same spread.
+- Next-due times live in a heap; the main loop sleeps until next_due().
+"""
+
+import heapq
+import math
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    SCHEDULE_TIMEZONE,
+    SCHEDULE_DAY_START_HOUR,
+    SCHEDULE_DAY_END_HOUR,
+    SCHEDULE_DAY_INTERVAL_SEC,
+    SCHEDULE_NIGHT_INTERVAL_SEC,
+)
+
+try:
+    from zoneinfo import ZoneInfo  # Python 3.9+
+except Exception:
+    ZoneInfo = None
+
+
+def _tz(name: Optional[str]):
+    if not name or ZoneInfo is None:
+        return None  # system local time
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        return None
+
+
+class Profile:
+    """Day/night cadence in one time zone."""
+
+    def __init__(self, timezone: Optional[str], day_start: float, day_end: float,
+                 day_interval: float, night_interval: float):
+        self.tz = _tz(timezone)
+        self.day_start = float(day_start)
+        self.day_end = float(day_end)
+        self.day_interval = max(1.0, float(day_interval))
+        self.night_interval = max(1.0, float(night_interval))
+
+    def interval_at(self, ts: float) -> float:
+        dt = datetime.fromtimestamp(ts, self.tz)
+        hour = dt.hour + dt.minute / 60.0
+        if self.day_start <= self.day_end:
+            is_day = self.day_start <= hour < self.day_end
+        else:  # window wraps midnight
+            is_day = hour >= self.day_start or hour < self.day_end
+        return self.day_interval if is_day else self.night_interval
+
+
+def profile_for(camera: Dict[str, Any]) -> Profile:
+    """Camera record overrides on top of the SCHEDULE_* defaults."""
+    s = camera.get("schedule") or {}
+    fixed = camera.get("interval_sec")
+
+    def pick(key: str, default: Any) -> Any:
+        v = s.get(key)
+        return default if v in (None, "") else v
+
+    day = pick("dayIntervalSec", fixed or SCHEDULE_DAY_INTERVAL_SEC)
+    night = pick("nightIntervalSec", fixed or SCHEDULE_NIGHT_INTERVAL_SEC)
+    try:
+        return Profile(pick("timezone", SCHEDULE_TIMEZONE),
+                       pick("dayStart", SCHEDULE_DAY_START_HOUR),
+                       pick("dayEnd", SCHEDULE_DAY_END_HOUR),
+                       day, night)
+    except (TypeError, ValueError):
+        return Profile(SCHEDULE_TIMEZONE, SCHEDULE_DAY_START_HOUR, SCHEDULE_DAY_END_HOUR,
+                       SCHEDULE_DAY_INTERVAL_SEC, SCHEDULE_NIGHT_INTERVAL_SEC)
+
+
+def _camera_key(camera: Dict[str, Any]) -> str:
+    return camera.get("key") or camera.get("id") or "unknown"
+
+
+class Scheduler:
+    """Timer heap of per-camera next-due times."""
+
+    def __init__(self, group_size: int = 1):
+        self.group_size = max(1, int(group_size))
+        self._heap: List[Tuple[float, str]] = []
+        self._cams: Dict[str, Dict[str, Any]] = {}
+        self._profiles: Dict[str, Profile] = {}
+        self._phase: Dict[str, float] = {}   # 0..1 share of the interval
+
+    def __len__(self) -> int:
+        return len(self._cams)
+
+    def _next_slot(self, key: str, after: float) -> float:
+        """First wall-clock slot of this camera strictly after `after`."""
+        interval = self._profiles[key].interval_at(after)
+        offset = self._phase[key] * interval
+        k = math.floor((after - offset) / interval) + 1
+        return k * interval + offset
+
+    def _push(self, key: str, due: float) -> None:
+        heapq.heappush(self._heap, (due, key))
+
+    def sync(self, cameras: List[Dict[str, Any]], now: float) -> None:
+        """Adopt a new camera list; phases are re-spread only if membership changed."""
+        new = {_camera_key(c): c for c in cameras}
+        membership_changed = set(new) != set(self._cams)
+        self._cams = new
+        self._profiles = {k: profile_for(c) for k, c in new.items()}
+
+        if not membership_changed:
+            return
+
+        # even spread over groups in a stable order; a per-device offset (hash
+        # of the camera set) keeps two sites from firing in lockstep
+        keys = sorted(new, key=lambda k: zlib.crc32(k.encode("utf-8")))
+        groups = max(1, math.ceil(len(keys) / self.group_size))
+        base = (zlib.crc32(",".join(sorted(keys)).encode("utf-8")) % 1000) / 1000.0 / groups
+        self._phase = {k: ((i // self.group_size) / groups + base) % 1.0
+                       for i, k in enumerate(keys)}
+
+        self._heap = []
+        for k in keys:
+            self._push(k, self._next_slot(k, now))
+
+    def next_due(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float, window: float = 0.0) -> List[Tuple[Dict[str, Any], float]]:
+        """(camera, due time) for every camera due by now + window; each is rescheduled."""
+        out = []
+        while self._heap and self._heap[0][0] <= now + window:
+            due, key = heapq.heappop(self._heap)
+            out.append((self._cams[key], due))
+            # missed slots (long tick, suspend) are skipped, not replayed
+            self._push(key, self._next_slot(key, max(now, due)))
+        return out
@@ -0,0 +1,134 @@
+"""
+Bounded offline spool.
+
+Retention cleanup only removes rows that were uploaded, so during a long
+outage frames/ and the DB grow with the backlog. enforce() keeps
+frames/ + edge_data.db under SPOOL_MAX_BYTES: once over the budget it
+evicts frame files down to SPOOL_LOW_WATER of it, cheapest loss first
+(db.SPOOL_TIERS):
+
+1. "synced"    frames of rows already uploaded (only the local copy goes)
+2. "annotated" annotated copies of pending rows (render.py can redraw
+               them from RAW + meta)
+3. "empty"     RAW of pending rows with zero detections
+4. "oldest"    RAW of remaining pending rows, oldest rows first
+
+Rows (meta) are never evicted, but the server only accepts a row with its
+RAW frame: a pending row that loses RAW is given up (synced=1,
+missing_files=1) rather than retried forever. Every dropped file is logged
+in the spool_drops table (row, camera, kind, path, bytes, reason).
+"""
+
+import os
+import time
+from typing import List, Optional, Tuple
+
+from colorama import Fore, Style
+
+from config import (
+    DB_NAME,
+    SPOOL_MAX_BYTES,
+    SPOOL_LOW_WATER,
+    SPOOL_EVICT_CHUNK,
+)
+from db import (SPOOL_TIERS, get_spool_candidates, record_spool_drops,
+                disk_usage_total, remove_files, clear_frame_paths)
+import metrics
+
+
+def sp_info(m): print(Fore.CYAN + m + Style.RESET_ALL)
+def sp_warn(m): print(Fore.YELLOW + m + Style.RESET_ALL)
+
+
+def _db_bytes() -> int:
+    total = 0
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            total += os.path.getsize(DB_NAME + suffix)
+        except OSError:
+            pass
+    return total
+
+
+def usage() -> int:
+    """Bytes held by the spool: the frames/ size index plus the DB files."""
+    return disk_usage_total() + _db_bytes()
+
+
+def _file_size(path: Optional[str]) -> Optional[int]:
+    """Size of an existing frame file; None if it is already gone."""
+    try:
+        return os.path.getsize(path) if path and os.path.isfile(path) else None
+    except OSError:
+        return None
+
+
+def _picks(tier: str, raw: Optional[str], ann: Optional[str]) -> List[Tuple[str, Optional[str]]]:
+    if tier == "annotated":
+        return [("annotated", ann)]
+    # annotated first: if the budget is met after it, RAW survives
+    return [(kind, p) for kind, p in (("annotated", ann), ("raw", raw)) if p]
+
+
+def _evict(need: int) -> int:
+    """Drop frames tier by tier until `need` bytes are freed; returns bytes freed."""
+    freed = 0
+    for tier in SPOOL_TIERS:
+        after_id = 0
+        while freed < need:
+            rows = get_spool_candidates(tier, after_id, SPOOL_EVICT_CHUNK)
+            if not rows:
+                break
+            drops = []
+            gone = {"raw": [], "annotated": []}
+            for row_id, cam, created_at, raw, ann in rows:
+                after_id = row_id
+                for kind, path in _picks(tier, raw, ann):
+                    size = _file_size(path)
+                    if size is None:
+                        # deleted elsewhere (e.g. RAW after sync): not a drop,
+                        # just stop the row from matching again
+                        gone[kind].append(row_id)
+                        continue
+                    drops.append((row_id, cam, created_at, kind, path, size, tier))
+                    freed += size
+                    if freed >= need:
+                        break
+                if freed >= need:
+                    break
+
+            for kind, ids in gone.items():
+                clear_frame_paths(ids, kind)
+            if not drops:
+                continue
+
+            # rows first, so sync never opens a file that is about to vanish
+            record_spool_drops(drops)
+            remove_files([d[4] for d in drops])
+            metrics.SPOOL_EVICTED_BYTES.inc(sum(d[5] for d in drops), tier=tier)
+            metrics.SPOOL_EVICTED_FILES.inc(len(drops), tier=tier)
+            sp_warn(f"[SPOOL] evicted {len(drops)} {tier} frame file(s)")
+        if freed >= need:
+            break
+    return freed
+
+
+def enforce(max_bytes: Optional[int] = SPOOL_MAX_BYTES) -> int:
+    """One budget check; evicts frames if over budget. Returns bytes freed."""
+    if not max_bytes:
+        return 0
+    t0 = time.perf_counter()
+    used = usage()
+    metrics.SPOOL_BYTES.set(used)
+    if used <= max_bytes:
+        return 0
+
+    need = used - int(max_bytes * SPOOL_LOW_WATER)
+    freed = _evict(need)
+    metrics.SPOOL_BYTES.set(used - freed)
+    if freed < need:
+        sp_warn(f"[SPOOL] over budget by {need - freed} bytes with no frames left "
+                f"to evict (DB {_db_bytes()} bytes)")
+    sp_info(f"[SPOOL] freed {freed} bytes in {time.perf_counter() - t0:.1f}s "
+            f"(used {used} / budget {max_bytes})")
+    return freed
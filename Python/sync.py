@@ -1,9 +1,12 @@
 import json
 import os
+import threading
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from colorama import init as colorama_init, Fore, Style
 
 from config import (
@@ -13,8 +16,21 @@ from config import (
     BACKOFF_MAX,
     REQUESTS_VERIFY_TLS,
     DELETE_RAW_AFTER_SUCCESS_SYNC,
+    SYNC_CONCURRENCY,
+    SYNC_BULK_URL,
+    SYNC_BULK_MAX_BYTES,
+    SYNC_BULK_REPROBE_SEC,
+    ROLLUP_ENABLED,
+    ROLLUP_URL,
+    ROLLUP_MAX_WINDOWS,
 )
-from db import get_unsynced_rows, mark_synced, mark_missing_files
+from encode import MIME_TYPES, transcode_file
+from db import (get_unsynced_rows, mark_synced_many, mark_failed_many,
+                get_closed_rollups, mark_rollups_synced, remove_files,
+                clear_frame_paths)
+from rollup import build_records
+from metacodec import decode_meta, for_upload, PACKED_MIME
+import metrics
 
 colorama_init(autoreset=True)
 
@@ -66,33 +82,95 @@ def _increase_backoff() -> None:
     _warn(f"[BACKOFF] next sync attempt after {_current_backoff}s")
 
 
-def _send(meta_json: str, raw_path: Optional[str], ann_path: Optional[str]) -> bool:
+def backoff_remaining() -> float:
+    """Seconds until the next sync attempt is allowed (0 when not backing off)."""
+    return max(0.0, _next_allowed_sync_ts - time.time()) if _next_allowed_sync_ts else 0.0
+
+
+metrics.BACKOFF_SECONDS.set_function(backoff_remaining)
+
+
+# ---------------- upload engine ----------------
+
+# _send outcomes
+_SENT = "sent"                # HTTP 200
+_REJECTED = "rejected"        # server refused this row (4xx) -> per-row retry
+_UNAVAILABLE = "unavailable"  # network / 5xx / 429 -> endpoint backoff
+
+_session: Optional[requests.Session] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_engine_lock = threading.Lock()
+
+
+def _get_engine() -> Tuple[requests.Session, ThreadPoolExecutor]:
+    """Shared pooled session + upload workers (created on first use)."""
+    global _session, _executor
+    with _engine_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=SYNC_CONCURRENCY)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=SYNC_CONCURRENCY, thread_name_prefix="sync")
+    return _session, _executor
+
+
+def _upload_settings(meta_json: str) -> Optional[Dict[str, Any]]:
+    """Encode settings recorded in meta["compute"]["encode"], if a smaller upload is wanted."""
+    try:
+        enc = decode_meta(meta_json)["compute"]["encode"]
+    except Exception:
+        return None
+    if not isinstance(enc, dict) or not enc.get("upload_max_width"):
+        return None
+    return enc
+
+
+def _open_frame(path: str, name: str, upload: Optional[Dict[str, Any]]) -> Tuple[str, Any, str]:
+    """Multipart file tuple for a stored frame, re-encoded to the upload width if set."""
+    ext = os.path.splitext(path)[1].lstrip(".").lower() or "jpg"
+    if upload is not None:
+        fmt = upload.get("format", ext)
+        try:
+            data = transcode_file(path, fmt, int(upload.get("quality", 85)),
+                                  upload["upload_max_width"])
+            if data is not None:
+                return f"{name}.{fmt}", data, MIME_TYPES.get(fmt, "image/jpeg")
+        except Exception as e:
+            _warn(f"[SYNC] upload re-encode failed, sending stored file: {e}")
+    return f"{name}.{ext}", open(path, "rb"), MIME_TYPES.get(ext, "image/jpeg")
+
+
+def _send(meta_json: str, raw_path: Optional[str], ann_path: Optional[str],
+          upload: Optional[Dict[str, Any]] = None) -> str:
     """Send one record to the cloud using multipart/form-data.
 
-    meta_json is always sent. raw_path / ann_path are optional JPEGs.
-    Returns True if the server responded with HTTP 200.
+    meta_json is always sent. raw_path / ann_path are optional frames
+    (re-encoded smaller first if `upload` asks for it).
+    Returns _SENT on HTTP 200, _REJECTED if the server refused this record,
+    or _UNAVAILABLE if the endpoint itself is failing.
     """
-    files = {"meta": (None, meta_json, "application/json")}
+    session, _ = _get_engine()
+    files = {"meta": (None, *for_upload(meta_json))}  # JSON or packed (metacodec)
 
     if raw_path:
         try:
-            files["frame_raw"] = ("raw.jpg", open(
-                raw_path, "rb"), "image/jpeg")
+            files["frame_raw"] = _open_frame(raw_path, "raw", upload)
         except Exception as e:
             _warn(f"[SYNC] cannot open raw: {e}")
 
     if ann_path:
         try:
-            files["frame_annotated"] = (
-                "annotated.jpg",
-                open(ann_path, "rb"),
-                "image/jpeg",
-            )
+            files["frame_annotated"] = _open_frame(
+                ann_path, "annotated", upload)
         except Exception as e:
             _warn(f"[SYNC] cannot open annotated: {e}")
 
     try:
-        r = requests.post(
+        r = session.post(
             API_URL,
             files=files,
             timeout=5,  # keep relatively low so we never block for too long
@@ -101,10 +179,14 @@ def _send(meta_json: str, raw_path: Optional[str], ann_path: Optional[str]) -> b
         _info(f"[SYNC] server status: {r.status_code}")
         if r.text:
             print(r.text[:400])
-        return r.status_code == 200
+        if r.status_code == 200:
+            return _SENT
+        if 400 <= r.status_code < 500 and r.status_code not in (408, 429):
+            return _REJECTED
+        return _UNAVAILABLE
     except Exception as e:
         _err(f"[SYNC] HTTP error: {e}")
-        return False
+        return _UNAVAILABLE
     finally:
         # Ensure all file handles are closed
         for k in ("frame_raw", "frame_annotated"):
@@ -115,15 +197,317 @@ def _send(meta_json: str, raw_path: Optional[str], ann_path: Optional[str]) -> b
                     pass
 
 
-def sync_unsent_once() -> None:
-    """Attempt a non-blocking sync of unsent rows."""
+def _prepare_row(row) -> Optional[Tuple[str, Optional[str], Optional[str], Optional[Dict[str, Any]]]]:
+    """Return (meta_json, raw_path, ann_path, upload settings) to send, or None if RAW is missing."""
+    row_id, ts, cam, cnt, meta_json, raw_path, ann_path = row
+
+    # -------------------------
+    # RAW MUST EXIST (mandatory)
+    # -------------------------
+    if not raw_path or not os.path.isfile(raw_path):
+        _warn(
+            f"[SYNC] Skipped row id={row_id}: RAW image missing -> {raw_path}"
+        )
+        return None
+
+    # ---------------------------------
+    # Annotated file is optional
+    # ---------------------------------
+    use_ann = ann_path
+    if use_ann and not os.path.isfile(use_ann):
+        _warn(
+            f"[SYNC] Annotated file missing for id={row_id}, continuing without it -> {use_ann}"
+        )
+        use_ann = None
+
+    # Prepare meta fallback
+    if not meta_json:
+        meta_json = json.dumps(
+            {
+                "timestamp_utc": ts,
+                "camera_id": cam,
+                "people": {"count": cnt},
+            }
+        )
+    return meta_json, raw_path, use_ann, _upload_settings(meta_json)
+
+
+def _upload_row(row, halt: threading.Event) -> List[Tuple[tuple, Optional[str]]]:
+    """Worker task: upload one row unless the endpoint was declared down."""
+    if halt.is_set():
+        return [(row, None)]  # not attempted; stays pending without a strike
+    row_id, _, cam = row[:3]
+    meta_json, use_raw, use_ann, upload = row[7]
+
+    _info(
+        f"[SYNC] Sending row id={row_id} (cam={cam}) with RAW: {use_raw}"
+        + (f", ANN: {use_ann}" if use_ann else ", ANN: None")
+    )
+    outcome = _send(meta_json, use_raw, use_ann, upload)
+    if outcome == _UNAVAILABLE:
+        halt.set()  # stop the rest of the batch; the endpoint is in trouble
+    return [(row, outcome)]
+
+
+# ---------------- bulk protocol ----------------
+#
+# One multipart POST to SYNC_BULK_URL carries N rows:
+#   meta                 -> JSON array of the rows' meta objects
+#   frame_raw_<i>        -> RAW JPEG of item i
+#   frame_annotated_<i>  -> ANNOTATED JPEG of item i (optional)
+# and the server answers 200 with a per-item result list:
+#   { "results": [ { "index": 0, "ok": true }, ... ] }
+# (optionally wrapped in ApiResponse "data"/"result").
+# Before the first bulk POST, and again after each refusal window, an
+# OPTIONS request checks that the route exists, so frames are never
+# shipped to a URL that only answers 404.
+
+# status codes meaning "this server has no bulk endpoint"
+_BULK_UNSUPPORTED = (404, 405, 415, 501)
+
+# OPTIONS answers meaning "no such route" (a POST-only route may answer 405)
+_BULK_PROBE_MISSING = (404, 501)
+
+_bulk_disabled_until: float = 0.0
+_bulk_probe_due: bool = True  # check the route before sending frames to it
+
+
+def _probe_bulk() -> Optional[bool]:
+    """Cheap OPTIONS request: does SYNC_BULK_URL exist? No frames are sent.
+    None if the server could not be reached (ask again next pass)."""
+    session, _ = _get_engine()
+    try:
+        r = session.options(SYNC_BULK_URL, timeout=10, verify=REQUESTS_VERIFY_TLS)
+    except Exception as e:
+        _err(f"[SYNC] bulk probe HTTP error: {e}")
+        return None
+    return r.status_code not in _BULK_PROBE_MISSING
+
+
+def _bulk_available() -> bool:
+    global _bulk_probe_due
+    if not SYNC_BULK_URL or time.time() < _bulk_disabled_until:
+        return False
+    if _bulk_probe_due:
+        found = _probe_bulk()
+        if found is None:
+            return False
+        if not found:
+            _disable_bulk()
+            return False
+        _bulk_probe_due = False
+    return True
+
+
+def _disable_bulk() -> None:
+    global _bulk_disabled_until, _bulk_probe_due
+    _bulk_disabled_until = time.time() + SYNC_BULK_REPROBE_SEC
+    _bulk_probe_due = True
+    _warn(
+        f"[SYNC] bulk upload not supported by server; "
+        f"single-row mode for {SYNC_BULK_REPROBE_SEC}s")
+
+
+def _row_bytes(row) -> int:
+    # stored sizes; an upload re-encode only ever makes the request smaller
+    meta_json, use_raw, use_ann, _ = row[7]
+    size = len(meta_json)
+    for path in (use_raw, use_ann):
+        if path:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+    return size
+
+
+def _pack_batches(work: list) -> List[list]:
+    """Split rows into bulk requests bounded by SYNC_BATCH_SIZE and SYNC_BULK_MAX_BYTES."""
+    batches: List[list] = []
+    current: list = []
+    current_bytes = 0
+    for row in work:
+        size = _row_bytes(row)
+        if current and (len(current) >= SYNC_BATCH_SIZE
+                        or current_bytes + size > SYNC_BULK_MAX_BYTES):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(row)  # an oversized row still goes, on its own
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _parse_bulk_results(data: Any, n: int) -> List[str]:
+    if isinstance(data, dict):
+        for key in ("data", "result"):
+            if isinstance(data.get(key), (dict, list)):
+                data = data[key]
+                break
+    results = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(results, list):
+        raise ValueError("bulk response has no results list")
+
+    outcomes = [_REJECTED] * n  # items the server didn't mention get retried
+    for pos, item in enumerate(results):
+        if isinstance(item, dict):
+            idx = int(item.get("index", pos))
+            ok = bool(item.get("ok", item.get("success", False)))
+        else:
+            idx, ok = pos, bool(item)
+        if 0 <= idx < n:
+            outcomes[idx] = _SENT if ok else _REJECTED
+    return outcomes
+
+
+def _send_bulk(rows: list) -> Optional[List[str]]:
+    """POST many rows at once. Returns one outcome per row, or None if the
+    server doesn't support bulk (caller falls back to single-row uploads)."""
+    session, _ = _get_engine()
+    files = []
+    metas = []
+    handles = []
+    try:
+        for i, row in enumerate(rows):
+            meta_json, use_raw, use_ann, upload = row[7]
+            try:
+                text, mime = for_upload(meta_json)
+                # packed items travel as their "pk1:..." strings
+                metas.append(text if mime == PACKED_MIME else json.loads(text))
+            except Exception:
+                metas.append({"raw": meta_json})
+            for field, path in ((f"frame_raw_{i}", use_raw),
+                                (f"frame_annotated_{i}", use_ann)):
+                if not path:
+                    continue
+                try:
+                    part = _open_frame(path, field, upload)
+                except Exception as e:
+                    _warn(f"[SYNC] cannot open {field}: {e}")
+                    continue
+                if hasattr(part[1], "close"):
+                    handles.append(part[1])
+                files.append((field, part))
+        files.insert(0, ("meta", (None, json.dumps(
+            metas, ensure_ascii=False), "application/json")))
+
+        r = session.post(
+            SYNC_BULK_URL,
+            files=files,
+            timeout=30,
+            verify=REQUESTS_VERIFY_TLS,
+        )
+        _info(f"[SYNC] bulk server status: {r.status_code} ({len(rows)} rows)")
+        if r.status_code in _BULK_UNSUPPORTED:
+            _disable_bulk()
+            return None
+        if r.status_code == 413:
+            return None  # too large for this server: send these one by one
+        if r.status_code == 200:
+            try:
+                return _parse_bulk_results(r.json(), len(rows))
+            except Exception as e:
+                _warn(f"[SYNC] unexpected bulk response ({e}); single-row mode")
+                _disable_bulk()
+                return None
+        if 400 <= r.status_code < 500 and r.status_code not in (408, 429):
+            return [_REJECTED] * len(rows)
+        return [_UNAVAILABLE] * len(rows)
+    except Exception as e:
+        _err(f"[SYNC] bulk HTTP error: {e}")
+        return [_UNAVAILABLE] * len(rows)
+    finally:
+        for fh in handles:
+            try:
+                fh.close()
+            except Exception:
+                pass
+
+
+def _upload_bulk(rows: list, halt: threading.Event) -> List[Tuple[tuple, Optional[str]]]:
+    """Worker task: upload one packed batch, falling back to single rows."""
+    if halt.is_set():
+        return [(row, None) for row in rows]
+
+    outcomes = _send_bulk(rows) if len(rows) > 1 else None
+    if outcomes is None:
+        out: List[Tuple[tuple, Optional[str]]] = []
+        for row in rows:
+            out.extend(_upload_row(row, halt))
+        return out
+
+    if _UNAVAILABLE in outcomes:
+        halt.set()
+    return list(zip(rows, outcomes))
+
 
-    global _next_allowed_sync_ts
+# ---------------- rollups ----------------
+#
+# Closed rollup windows (rollup.py) go to ROLLUP_URL as one small JSON POST:
+#   { "rollups": [ {camera_id, window_start, window_sec, samples, total, classes}, ... ] }
 
-    now = time.time()
+_rollups_disabled_until: float = 0.0
+
+
+def _sync_rollups() -> Optional[str]:
+    """Upload up to ROLLUP_MAX_WINDOWS closed windows; returns the outcome (None = nothing to do)."""
+    global _rollups_disabled_until
+    if time.time() < _rollups_disabled_until:
+        return None
+    rows = get_closed_rollups(time.time(), ROLLUP_MAX_WINDOWS)
+    if not rows:
+        return None
+
+    records = build_records(rows)
+    body = json.dumps({"rollups": records}, separators=(",", ":"))
+    session, _ = _get_engine()
+    try:
+        r = session.post(ROLLUP_URL, data=body, timeout=10,
+                         headers={"Content-Type": "application/json"},
+                         verify=REQUESTS_VERIFY_TLS)
+    except Exception as e:
+        _err(f"[SYNC] rollup HTTP error: {e}")
+        return _UNAVAILABLE
+
+    windows = [(rec["camera_id"], rec["window_start"]) for rec in records]
+    if r.status_code == 200:
+        mark_rollups_synced(windows)
+        metrics.UPLOAD_BYTES.inc(len(body))
+        _ok(f"[SYNC] uploaded {len(records)} rollup window(s) ({len(body)} bytes)")
+        return _SENT
+    if r.status_code in _BULK_UNSUPPORTED:
+        _rollups_disabled_until = time.time() + SYNC_BULK_REPROBE_SEC
+        _warn(f"[SYNC] rollup endpoint not available ({r.status_code}); "
+              f"retrying in {SYNC_BULK_REPROBE_SEC}s")
+        return _REJECTED
+    if 400 <= r.status_code < 500 and r.status_code not in (408, 429):
+        # a payload the server will never accept must not block newer windows
+        mark_rollups_synced(windows)
+        _warn(f"[SYNC] server rejected {len(records)} rollup window(s) "
+              f"({r.status_code}); dropped")
+        return _REJECTED
+    return _UNAVAILABLE
+
+
+def sync_unsent_once() -> None:
+    """Upload a batch of unsent rows, SYNC_CONCURRENCY at a time.
+
+    - Backoff applies to the endpoint: network errors / 5xx stop the batch.
+    - A row the server rejects is retried later on its own schedule
+      (db.mark_failed_many) and doesn't hold up the rest of the queue.
+    - With SYNC_BULK_URL set, rows are packed into multi-row requests and
+      fall back to single-row mode if the server doesn't support it.
+    - With ROLLUP_ENABLED, closed rollup windows are uploaded first.
+    """
 
     # Respect backoff window
-    if _next_allowed_sync_ts and now < _next_allowed_sync_ts:
+    if _next_allowed_sync_ts and time.time() < _next_allowed_sync_ts:
+        return
+
+    if ROLLUP_ENABLED and _sync_rollups() == _UNAVAILABLE:
+        _err(f"[SYNC] Endpoint unavailable, entering backoff for {_current_backoff}s")
+        _increase_backoff()
         return
 
     rows = get_unsynced_rows(SYNC_BATCH_SIZE)
@@ -131,66 +515,67 @@ def sync_unsent_once() -> None:
         # nothing to sync
         return
 
-    for row_id, ts, cam, cnt, meta_json, raw_path, ann_path in rows:
-
-        # -------------------------
-        # RAW MUST EXIST (mandatory)
-        # -------------------------
-        if not raw_path or not os.path.isfile(raw_path):
-            _warn(
-                f"[SYNC] Skipped row id={row_id}: RAW image missing -> {raw_path}"
-            )
-            mark_missing_files(row_id)
-            mark_synced(row_id)
-            continue  # move to next DB row
-
-        use_raw = raw_path
-        use_ann = ann_path
-
-        # ---------------------------------
-        # Annotated file is optional
-        # ---------------------------------
-        if use_ann and not os.path.isfile(use_ann):
-            _warn(
-                f"[SYNC] Annotated file missing for id={row_id}, continuing without it -> {use_ann}"
-            )
-            use_ann = None
-
-        # Prepare meta fallback
-        if not meta_json:
-            meta_json = json.dumps(
-                {
-                    "timestamp_utc": ts,
-                    "camera_id": cam,
-                    "people": {"count": cnt},
-                }
-            )
-
-        # ---------------------------------
-        # Attempt sending (raw is guaranteed)
-        # ---------------------------------
-        _info(
-            f"[SYNC] Sending row id={row_id} (cam={cam}) with RAW: {use_raw}"
-            + (f", ANN: {use_ann}" if use_ann else ", ANN: None")
-        )
-
-        ok = _send(meta_json, use_raw, use_ann)
-
-        if ok:
-            _ok(f"[SYNC] Successfully synced row id={row_id}")
-            mark_synced(row_id)
-            _reset_backoff()
+    # collected during the batch, committed in bulk at the end
+    synced_ids = []
+    missing_ids = []
+    failed_ids = []
+    sent_raw_paths = []
+
+    work = []
+    for row in rows:
+        prepared = _prepare_row(row)
+        if prepared is None:
+            missing_ids.append(row[0])
+        else:
+            work.append((*row, prepared))
 
-            # Optional cleanup
-            if DELETE_RAW_AFTER_SUCCESS_SYNC and os.path.isfile(use_raw):
-                try:
-                    os.remove(use_raw)
-                except Exception:
-                    _warn(
-                        f"[SYNC] Could not delete RAW file after sync -> {use_raw}")
+    _, executor = _get_engine()
+    halt = threading.Event()
+    try:
+        if _bulk_available():
+            futures = {executor.submit(_upload_bulk, batch, halt): batch
+                       for batch in _pack_batches(work)}
         else:
-            _err(
-                f"[SYNC] Failed syncing row id={row_id}, entering backoff for {_current_backoff}s"
-            )
-            _increase_backoff()
-            break  # stop this batch on first failure
+            futures = {executor.submit(_upload_row, row, halt): [row]
+                       for row in work}
+
+        for fut in as_completed(futures):
+            try:
+                outcomes = fut.result()
+            except Exception as e:
+                _err(f"[SYNC] upload task error: {e}")
+                outcomes = [(row, _REJECTED) for row in futures[fut]]
+
+            for row, outcome in outcomes:
+                row_id = row[0]
+                metrics.UPLOAD_ROWS.inc(outcome=outcome or "skipped")
+                if outcome == _SENT:
+                    metrics.UPLOAD_BYTES.inc(_row_bytes(row))
+                    _ok(f"[SYNC] Successfully synced row id={row_id}")
+                    synced_ids.append(row_id)
+                    sent_raw_paths.append((row_id, row[7][1]))
+                elif outcome == _REJECTED:
+                    _warn(
+                        f"[SYNC] Server rejected row id={row_id}; will retry it later")
+                    failed_ids.append(row_id)
+    finally:
+        # one statement + one commit per state, however big the batch was
+        mark_synced_many(missing_ids, missing_files=True)
+        mark_synced_many(synced_ids)
+        mark_failed_many(failed_ids, BACKOFF_START, BACKOFF_MAX)
+
+    if halt.is_set():
+        _err(
+            f"[SYNC] Endpoint unavailable, entering backoff for {_current_backoff}s"
+        )
+        _increase_backoff()
+    elif synced_ids:
+        _reset_backoff()
+
+    # Optional cleanup (only once the rows are committed as synced)
+    # (db.remove_files also takes them off the disk_usage index)
+    if DELETE_RAW_AFTER_SUCCESS_SYNC:
+        remove_files([p for _, p in sent_raw_paths])
+        # rows stop pointing at the deleted files (spool.py skips them)
+        clear_frame_paths([rid for rid, p in sent_raw_paths
+                           if p and not os.path.isfile(p)], "raw")